@@ -2,17 +2,165 @@
 IG API Client
 Handles all communication with IG Markets REST API
 """
+import logging
 import requests
+import threading
 import time
+import json
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Lightstreamer is optional - without it streaming is unavailable and callers keep polling
+try:
+    from lightstreamer.client import LightstreamerClient, Subscription, SubscriptionListener
+except ImportError:
+    LightstreamerClient = None
+    SubscriptionListener = object
+
+# orjson is optional - it decodes the polled responses faster, stdlib json is the fallback
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MARKETS_BULK_MAX_EPICS = 50  # Most epics IG accepts in one GET /markets?epics= call
+MAX_STREAMED_CONFIRMS = 100  # Unclaimed deal confirmations kept from the trade stream
+
+logger = logging.getLogger(__name__)  # Request/response tracing - enable with logging.DEBUG
+
+
+class RateLimitError(Exception):
+    """Raised when IG rejects a request for exceeding the API allowance"""
+
+
+class APIRequestError(Exception):
+    """Raised when an IG request fails and the caller asked to tell that apart from an empty result"""
+
+
+def _new_session():
+    """requests.Session with a connection pool big enough for the batch/bulk worker threads
+    
+    Keep-alive connections are reused across calls so only the first request pays the TLS handshake.
+    Idempotent requests (GETs) are retried on connection errors and gateway 502/503/504s - order POSTs never are.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16,
+                          max_retries=Retry(total=2, backoff_factor=0.1,
+                                            status_forcelist=(502, 503, 504), raise_on_status=False))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def parse_json(response):
+    """Decode a response body, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def _price_from_snapshot(snapshot):
+    """Turn an IG market snapshot into the bid/offer/mid dict used across the app"""
+    bid = snapshot.get('bid')
+    offer = snapshot.get('offer')
+    mid = (bid + offer) / 2 if bid and offer else None
+    
+    return {
+        'bid': bid,
+        'offer': offer,
+        'mid': mid,
+        'market_status': snapshot.get('marketStatus')
+    }
+
+
+def is_rate_limited(response):
+    """Check if a response is an IG rate-limit rejection (429 or exceeded-allowance 403)"""
+    if response.status_code == 429:
+        return True
+    return response.status_code == 403 and "exceeded" in response.text
+
+
+class _TradeStreamListener(SubscriptionListener):
+    """Forwards CONFIRMS/OPU/WOU messages from the TRADE stream to callbacks as dicts"""
+    
+    def __init__(self, on_opu, on_wou, on_confirm=None):
+        self.on_opu = on_opu
+        self.on_wou = on_wou
+        self.on_confirm = on_confirm
+    
+    def onItemUpdate(self, update):
+        for field, callback in (("CONFIRMS", self.on_confirm), ("OPU", self.on_opu), ("WOU", self.on_wou)):
+            value = update.getValue(field)
+            if value and callback:
+                try:
+                    callback(json.loads(value))
+                except Exception:
+                    logger.exception("Trade stream %s callback error", field)
+
+
+class _PriceStreamListener(SubscriptionListener):
+    """Forwards MARKET:<epic> updates to a callback as (epic, bid/offer/mid dict)"""
+    
+    def __init__(self, epics, on_update, on_status=None):
+        self.epics = list(epics)
+        self.on_update = on_update
+        self.on_status = on_status
+    
+    def _status(self, subscribed):
+        if self.on_status:
+            try:
+                self.on_status(self.epics, subscribed)
+            except Exception:
+                logger.exception("Price stream status callback error")
+    
+    def onSubscription(self):
+        self._status(True)
+    
+    def onSubscriptionError(self, code, message):
+        logger.warning("Price stream subscription rejected (%s): %s", code, message)
+        self._status(False)
+    
+    def onUnsubscription(self):
+        self._status(False)
+    
+    def onItemUpdate(self, update):
+        try:
+            epic = update.getItemName().split(":", 1)[1]
+            bid = update.getValue("BID")
+            offer = update.getValue("OFFER")
+            self.on_update(epic, _price_from_snapshot({
+                'bid': float(bid) if bid else None,
+                'offer': float(offer) if offer else None,
+                'marketStatus': update.getValue("MARKET_STATE")
+            }))
+        except Exception:
+            logger.exception("Price stream callback error")
+
 
 class IGClient:
     """Client for interacting with IG Markets API"""
     
     def __init__(self):
-        self.session = requests.Session()
+        self.session = _new_session()
         self.base_url = ""
         self.logged_in = False
         self.emergency_stop = False
+        
+        # Streaming (Lightstreamer) details from the login response
+        self.account_id = None
+        self.lightstreamer_endpoint = None
+        self.stream_client = None
+        
+        # Short-lived working orders snapshot shared by the strategy loops
+        self._orders_snapshot = None
+        self._orders_ts = 0
+        
+        # Deal confirmations pushed on the trade stream, claimed by check_deal_status
+        self._confirms = {}  # {dealReference: confirm}
+        self._confirms_cond = threading.Condition()
+        self._confirm_subscription = None
     
     def trigger_emergency_stop(self):
         """Trigger emergency stop - halts all trading operations"""
@@ -53,6 +201,10 @@ class IGClient:
                     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
                 })
                 
+                session_data = response.json()
+                self.account_id = session_data.get("currentAccountId")
+                self.lightstreamer_endpoint = session_data.get("lightstreamerEndpoint")
+                
                 self.logged_in = True
                 return True, "Connected successfully"
             else:
@@ -63,9 +215,111 @@ class IGClient:
     
     def disconnect(self):
         """Disconnect from IG API"""
+        if self.stream_client is not None:
+            try:
+                self.stream_client.disconnect()
+            except Exception as e:
+                print(f"Stream disconnect error: {str(e)}")
+            self.stream_client = None
+        self._confirm_subscription = None
+        
         self.logged_in = False
-        self.session = requests.Session()
+        self.session = _new_session()
         self.base_url = ""
+        self.account_id = None
+        self.lightstreamer_endpoint = None
+    
+    def _ensure_stream_client(self):
+        """Connect the shared Lightstreamer client if needed - returns False if streaming is unavailable"""
+        if LightstreamerClient is None:
+            print("lightstreamer-client-lib not available - install with: pip install lightstreamer-client-lib")
+            return False
+        
+        if not self.logged_in or not self.account_id or not self.lightstreamer_endpoint:
+            return False
+        
+        if self.stream_client is None:
+            client = LightstreamerClient(self.lightstreamer_endpoint, None)
+            client.connectionDetails.setUser(self.account_id)
+            client.connectionDetails.setPassword(
+                f"CST-{self.session.headers.get('CST')}|XST-{self.session.headers.get('X-SECURITY-TOKEN')}")
+            client.connect()
+            self.stream_client = client
+        return True
+    
+    def subscribe_trade_stream(self, on_opu=None, on_wou=None, on_confirm=None):
+        """
+        Subscribe to the TRADE:<accountId> Lightstreamer stream
+        
+        Every Working Order Update also drops the get_working_orders_cached snapshot.
+        
+        Args:
+            on_opu: Called with each Open Position Update as a dict
+            on_wou: Called with each Working Order Update as a dict
+            on_confirm: Called with each deal confirmation as a dict
+        
+        Returns:
+            Subscription to pass to unsubscribe_stream(), or None if streaming is unavailable
+        """
+        def handle_wou(update):
+            self._invalidate_orders()
+            if on_wou:
+                on_wou(update)
+        
+        try:
+            if not self._ensure_stream_client():
+                return None
+            
+            subscription = Subscription("DISTINCT", [f"TRADE:{self.account_id}"], ["CONFIRMS", "OPU", "WOU"])
+            subscription.addListener(_TradeStreamListener(on_opu, handle_wou, on_confirm))
+            self.stream_client.subscribe(subscription)
+            return subscription
+            
+        except Exception as e:
+            print(f"Stream subscribe error: {str(e)}")
+            return None
+    
+    def subscribe_prices(self, epics, on_update, on_status=None):
+        """
+        Subscribe to MARKET:<epic> Lightstreamer price updates
+        
+        Args:
+            epics: Epics to stream
+            on_update: Called with (epic, price dict) on every bid/offer change
+            on_status: Called with (epics, True) once the server confirms the subscription,
+                       and (epics, False) if it is rejected or ends
+        
+        Returns:
+            Subscription to pass to unsubscribe_stream(), or None if streaming is unavailable
+        """
+        try:
+            if not epics or not self._ensure_stream_client():
+                return None
+            
+            subscription = Subscription("MERGE", [f"MARKET:{epic}" for epic in epics],
+                                        ["BID", "OFFER", "MARKET_STATE"])
+            subscription.addListener(_PriceStreamListener(epics, on_update, on_status))
+            self.stream_client.subscribe(subscription)
+            return subscription
+            
+        except Exception as e:
+            print(f"Price stream subscribe error: {str(e)}")
+            return None
+    
+    def unsubscribe_stream(self, subscription):
+        """Remove a subscription created by one of the subscribe_* methods"""
+        if self.stream_client is None or subscription is None:
+            return
+        try:
+            self.stream_client.unsubscribe(subscription)
+        except Exception as e:
+            print(f"Stream unsubscribe error: {str(e)}")
+    
+    def is_stream_connected(self):
+        """Check if the Lightstreamer connection is up"""
+        if self.stream_client is None:
+            return False
+        return self.stream_client.getStatus().startswith("CONNECTED")
 
     def update_working_order(self, deal_id, new_level, stop_distance=None, guaranteed_stop=False):
             """Update the level of a working order, preserving stop loss if provided"""
@@ -88,15 +342,17 @@ class IGClient:
                 headers["_method"] = "PUT"
                 
                 response = self.session.post(url, json=update_data, headers=headers)
+                self._invalidate_orders()
                 
                 if response.status_code == 200:
-                    deal_ref = response.json().get('dealReference')
+                    deal_ref = parse_json(response).get('dealReference')
                     if deal_ref:
                         deal_status = self.check_deal_status(deal_ref)
                         if deal_status.get('dealStatus') == 'ACCEPTED':
                             return True, "Order updated"
                         else:
                             return False, deal_status.get('reason')
+                    return False, "No deal reference returned"
                 else:
                     return False, response.text
                     
@@ -110,18 +366,8 @@ class IGClient:
             response = self.session.get(url)
             
             if response.status_code == 200:
-                data = response.json()
-                snapshot = data.get('snapshot', {})
-                bid = snapshot.get('bid')
-                offer = snapshot.get('offer')
-                mid = (bid + offer) / 2 if bid and offer else None
-                
-                return {
-                    'bid': bid,
-                    'offer': offer,
-                    'mid': mid,
-                    'market_status': snapshot.get('marketStatus')
-                }
+                data = parse_json(response)
+                return _price_from_snapshot(data.get('snapshot', {}))
             else:
                 return None
                 
@@ -129,6 +375,41 @@ class IGClient:
             print(f"Price error: {str(e)}")
             return None
     
+    def get_markets_bulk(self, epics):
+        """
+        Get current prices for several epics with one request per 50 epics
+        
+        Args:
+            epics: list of epics
+        
+        Returns:
+            dict of {epic: price dict as returned by get_market_price}
+        """
+        epics = list(epics)
+        prices = {}
+        
+        headers = self.session.headers.copy()
+        headers["version"] = "2"
+        
+        for i in range(0, len(epics), MARKETS_BULK_MAX_EPICS):
+            chunk = epics[i:i + MARKETS_BULK_MAX_EPICS]
+            try:
+                url = f"{self.base_url}/markets"
+                response = self.session.get(url, params={"epics": ",".join(chunk)}, headers=headers)
+                
+                if response.status_code != 200:
+                    continue
+                
+                for market in parse_json(response).get('marketDetails', []):
+                    epic = (market.get('instrument') or {}).get('epic')
+                    if epic:
+                        prices[epic] = _price_from_snapshot(market.get('snapshot') or {})
+                        
+            except Exception as e:
+                print(f"Bulk price error: {str(e)}")
+        
+        return prices
+    
     def place_order(self, epic, direction, size, level, order_type="STOP", stop_distance=0, guaranteed_stop=False, limit_distance=0):
         """Place a single working order with optional stop loss and limit"""
         url = f"{self.base_url}/workingorders/otc"
@@ -159,26 +440,62 @@ class IGClient:
         # Add limit if specified
         if limit_distance > 0:
             order_data["limitDistance"] = str(limit_distance)
-            print(f"DEBUG: Adding limitDistance={limit_distance} to order")  # ADD THIS
         
-        print(f"DEBUG: Order data being sent: {order_data}")  # ADD THIS
+        logger.debug("Order data being sent: %s", order_data)
         
         headers = self.session.headers.copy()
         headers["version"] = "2"
         
         response = self.session.post(url, json=order_data, headers=headers)
-        print(f"DEBUG: Response status: {response.status_code}")  # ADD THIS
-        print(f"DEBUG: Response body: {response.text}")  # ADD THIS
+        self._invalidate_orders()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Order response %s: %s", response.status_code, response.text)
         return response
     
-    def check_deal_status(self, deal_reference):
-        """Check the status of a placed deal"""
+    def ping(self):
+        """Cheap GET /session - keeps the pooled connection warm between orders"""
+        if not self.logged_in:
+            return False
+        try:
+            return self.session.get(f"{self.base_url}/session").status_code == 200
+        except Exception as e:
+            print(f"Ping error: {str(e)}")
+            return False
+    
+    def stream_confirms(self):
+        """Take deal confirmations from the trade stream so check_deal_status can skip its GET
+        
+        Returns:
+            True if confirmations are streaming
+        """
+        if self._confirm_subscription is None:
+            self._confirm_subscription = self.subscribe_trade_stream(on_confirm=self._on_confirm)
+        return self._confirm_subscription is not None
+    
+    def _on_confirm(self, confirm):
+        with self._confirms_cond:
+            self._confirms[confirm.get('dealReference')] = confirm
+            while len(self._confirms) > MAX_STREAMED_CONFIRMS:
+                del self._confirms[next(iter(self._confirms))]  # Oldest first - amends nobody waits for
+            self._confirms_cond.notify_all()
+    
+    def check_deal_status(self, deal_reference, stream_timeout=2.0):
+        """Check the status of a placed deal
+        
+        With stream_confirms() on, waits up to stream_timeout seconds for the pushed confirmation
+        before falling back to GET /confirms.
+        """
+        if self._confirm_subscription is not None and self.is_stream_connected():
+            with self._confirms_cond:
+                if self._confirms_cond.wait_for(lambda: deal_reference in self._confirms, stream_timeout):
+                    return self._confirms.pop(deal_reference)
+        
         try:
             url = f"{self.base_url}/confirms/{deal_reference}"
             response = self.session.get(url)
             
             if response.status_code == 200:
-                return response.json()
+                return parse_json(response)
             else:
                 return {"error": f"Status check failed: {response.text}"}
                 
@@ -201,7 +518,7 @@ class IGClient:
             response = self.session.post(url, json=update_data, headers=headers)
             
             if response.status_code == 200:
-                deal_ref = response.json().get('dealReference')
+                deal_ref = parse_json(response).get('dealReference')
                 if deal_ref:
                     deal_status = self.check_deal_status(deal_ref)
                     if deal_status.get('dealStatus') == 'ACCEPTED':
@@ -241,7 +558,7 @@ class IGClient:
             response = self.session.post(url, json=update_data, headers=headers)
             
             if response.status_code == 200:
-                deal_ref = response.json().get('dealReference')
+                deal_ref = parse_json(response).get('dealReference')
                 if deal_ref:
                     deal_status = self.check_deal_status(deal_ref)
                     if deal_status.get('dealStatus') == 'ACCEPTED':
@@ -254,21 +571,94 @@ class IGClient:
         except Exception as e:
             return False, str(e)
     
-    def get_working_orders(self):
-        """Get list of working orders"""
+    def update_positions_batch(self, updates, rate_limiter=None, max_workers=8):
+        """
+        Apply several position updates at once
+        
+        IG has no multi-deal endpoint, so the update_position calls run concurrently
+        over the shared session instead of one after another.
+        
+        Args:
+            updates: list of update_position kwargs dicts (deal_id, stop_level, limit_level...)
+            rate_limiter: Optional TokenBucket to pace the calls
+        
+        Returns:
+            list of (success, message) tuples in the same order as updates
+        """
+        return self._run_batch(self.update_position, updates, rate_limiter, max_workers)
+    
+    def update_working_orders_batch(self, updates, rate_limiter=None, max_workers=5):
+        """
+        Apply several working order updates at once
+        
+        Args:
+            updates: list of update_working_order kwargs dicts (deal_id, new_level, stop_distance, guaranteed_stop)
+            rate_limiter: Optional TokenBucket to pace the calls
+        
+        Returns:
+            list of (success, message) tuples in the same order as updates
+        """
+        return self._run_batch(self.update_working_order, updates, rate_limiter, max_workers)
+    
+    def _run_batch(self, method, updates, rate_limiter, max_workers):
+        """Call method(**update) for each update concurrently over the shared session"""
+        def apply(update):
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            return method(**update) or (False, "No deal reference returned")
+        
+        if not updates:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(updates))) as executor:
+            return list(executor.map(apply, updates))
+    
+    def get_working_orders(self, raise_on_error=False):
+        """
+        Get list of working orders
+        
+        Args:
+            raise_on_error: Raise APIRequestError instead of returning [] when the request fails
+        """
         try:
             url = f"{self.base_url}/workingorders"
             response = self.session.get(url)
             
             if response.status_code == 200:
-                return response.json().get('workingOrders', [])
+                return parse_json(response).get('workingOrders', [])
+            elif raise_on_error:
+                raise APIRequestError(f"Working orders request failed ({response.status_code}): {response.text}")
             else:
                 return []
                 
+        except APIRequestError:
+            raise
         except Exception as e:
             print(f"Orders error: {str(e)}")
+            if raise_on_error:
+                raise APIRequestError(f"Working orders request failed: {e}") from e
             return []
     
+    def get_working_orders_cached(self, ttl=5):
+        """
+        Get working orders, reusing a fetch from the last ttl seconds
+        
+        Placing, updating or cancelling an order through this client drops the snapshot,
+        so callers never see levels older than their own changes.
+        """
+        snapshot = self._orders_snapshot
+        if snapshot is not None and time.monotonic() - self._orders_ts < ttl:
+            return snapshot
+        
+        snapshot = self.get_working_orders()
+        self._orders_snapshot = snapshot
+        self._orders_ts = time.monotonic()
+        return snapshot
+    
+    def _invalidate_orders(self):
+        """Force the next get_working_orders_cached call to refetch"""
+        self._orders_snapshot = None
+    
     def cancel_order(self, deal_id):
         """Cancel a working order"""
         try:
@@ -278,6 +668,7 @@ class IGClient:
             headers["version"] = "2"
             
             response = self.session.post(url, headers=headers)
+            self._invalidate_orders()
             
             if response.status_code == 200:
                 return True, f"Order {deal_id} cancelled"
@@ -287,19 +678,33 @@ class IGClient:
         except Exception as e:
             return False, f"Cancel error: {str(e)}"
     
-    def get_open_positions(self):
-        """Get list of open positions"""
+    def get_open_positions(self, raise_on_error=False):
+        """
+        Get list of open positions
+        
+        Args:
+            raise_on_error: Raise RateLimitError when throttled and APIRequestError on any other
+                failure, instead of returning [] - an empty list then always means no positions
+        """
         try:
             url = f"{self.base_url}/positions"
             response = self.session.get(url)
             
             if response.status_code == 200:
-                return response.json().get('positions', [])
+                return parse_json(response).get('positions', [])
+            elif raise_on_error and is_rate_limited(response):
+                raise RateLimitError(response.text)
+            elif raise_on_error:
+                raise APIRequestError(f"Positions request failed ({response.status_code}): {response.text}")
             else:
                 return []
                 
+        except (RateLimitError, APIRequestError):
+            raise
         except Exception as e:
             print(f"Positions error: {str(e)}")
+            if raise_on_error:
+                raise APIRequestError(f"Positions request failed: {e}") from e
             return []
     
     def close_position(self, deal_id, direction, size):
@@ -324,7 +729,7 @@ class IGClient:
             response = self.session.post(url, json=close_data, headers=headers)
             
             if response.status_code == 200:
-                deal_ref = response.json().get('dealReference')
+                deal_ref = parse_json(response).get('dealReference')
                 if deal_ref:
                     deal_status = self.check_deal_status(deal_ref)
                     if deal_status.get('dealStatus') == 'ACCEPTED':
@@ -336,34 +741,7 @@ class IGClient:
                 
         except Exception as e:
             return False, f"Close error: {str(e)}"
-    def place_limit_order(self, epic, direction, size, level):
-        """Place a limit order"""
-        url = f"{self.base_url}/workingorders/otc"
-    
-        # Determine expiry based on epic
-        if epic.startswith("IX.D") or epic == "CS.D.USCGC.TODAY.IP":
-            expiry = "DFB"
-        else:
-            expiry = "-"
-    
-        order_data = {
-            "epic": epic,
-            "expiry": expiry,
-            "direction": direction,
-            "size": str(size),
-            "level": str(level),
-            "type": "LIMIT",  # Changed from STOP
-            "timeInForce": "GOOD_TILL_CANCELLED",
-            "goodTillDate": None,
-            "guaranteedStop": "false",
-            "currencyCode": "GBP"
-        }
-    
-        headers = self.session.headers.copy()
-        headers["version"] = "2"
     
-        return self.session.post(url, json=order_data, headers=headers)
-
     def place_limit_order(self, epic, direction, size, level):
         """Place a limit order"""
         url = f"{self.base_url}/workingorders/otc"
@@ -390,7 +768,9 @@ class IGClient:
         headers = self.session.headers.copy()
         headers["version"] = "2"
         
-        return self.session.post(url, json=order_data, headers=headers)
+        response = self.session.post(url, json=order_data, headers=headers)
+        self._invalidate_orders()
+        return response
         
     def search_markets(self, search_term):
         """Search for markets by name"""
@@ -435,6 +815,8 @@ class IGClient:
                     'deal_size_unit': dealing_rules.get('minDealSize', {}).get('unit', 'AMOUNT'),
                     'min_stop_distance': float(dealing_rules.get('minNormalStopOrLimitDistance', {}).get('value', 0)),
                     'min_gslo_distance': float(dealing_rules.get('minControlledRiskStopDistance', {}).get('value', 0)),
+                    'margin_factor': market_data.get('marginFactor'),
+                    'margin_factor_unit': market_data.get('marginFactorUnit', 'PERCENTAGE'),
                 }
             else:
                 print(f"Failed to get market details: {response.status_code}")
@@ -346,7 +346,8 @@ class CachedMarketScanner:
             force_refresh: If True, ignore cache and fetch fresh data
         """
         from api.market_list import get_popular_markets
-        from api.yahoo_finance_helper import get_yahoo_ticker, get_historical_range, get_timeframe_period, get_current_price
+        from api.yahoo_finance_helper import (get_yahoo_ticker, get_historical_range, get_timeframe_period,
+                                              get_current_price, get_current_prices_for_epics)
         
         markets_list = get_popular_markets(filter_type)
         
@@ -369,6 +370,9 @@ class CachedMarketScanner:
         
         period = get_timeframe_period(timeframe)
         
+        # Current prices for every market up front - one spark request per 20 tickers instead of one each
+        current_prices = get_current_prices_for_epics([market.get('epic') for market in markets_list])
+        
         for idx, market in enumerate(markets_list, 1):
             epic = market.get('epic')
             name = market.get('instrumentName', 'Unknown')
@@ -416,8 +420,10 @@ class CachedMarketScanner:
                     }
                     self.save_cache()
                 
-                # Get current price from Yahoo
-                current_price = get_current_price(yahoo_ticker)
+                # Get current price from Yahoo - looked up on its own only if the spark request missed it
+                current_price = current_prices.get(epic)
+                if current_price is None:
+                    current_price = get_current_price(yahoo_ticker)
                 
                 if current_price is None:
                     log_func(f"  [{idx}/{len(markets_list)}] ✗ {name}: No current price")
@@ -0,0 +1,53 @@
+"""
+Rate Limiter
+Token bucket for pacing IG API calls without fixed sleeps
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket - blocks only when the request budget is used up"""
+
+    def __init__(self, rate, capacity):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens held (largest burst allowed)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens=1, cancel=None):
+        """Take tokens from the bucket, waiting for a refill if needed
+        
+        Returns False without taking anything if the cancel Event is set while waiting.
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if cancel is None:
+                time.sleep(wait)
+            elif cancel.wait(wait):
+                return False
+
+    def penalize(self, seconds):
+        """Back off after a rate-limit rejection - the next acquire waits at least this long
+        
+        Penalties don't stack, so several requests rejected together cost one back-off, not one each.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
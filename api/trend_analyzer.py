@@ -126,8 +126,8 @@ class TrendAnalyzer:
         
         # Check cache
         if cache_key in self.cache:
-            cache_time = self.cache_timestamps.get(cache_key, 0)
-            if time.time() - cache_time < self.cache_duration:
+            cache_time = self.cache_timestamps.get(cache_key, float('-inf'))
+            if time.monotonic() - cache_time < self.cache_duration:
                 return self.cache[cache_key]
         
         # Fetch new data
@@ -158,7 +158,7 @@ class TrendAnalyzer:
             if data is not None and len(data) > 0:
                 # Cache it
                 self.cache[cache_key] = data
-                self.cache_timestamps[cache_key] = time.time()
+                self.cache_timestamps[cache_key] = time.monotonic()
                 return data
             
             return None
@@ -3,8 +3,24 @@ Yahoo Finance Helper
 Maps IG epics to Yahoo tickers and fetches historical data
 """
 import yfinance as yf
+import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+# Yahoo spark endpoint - quotes for up to 20 symbols per call, no cookie/crumb needed
+SPARK_URL = "https://query1.finance.yahoo.com/v8/finance/spark"
+SPARK_MAX_SYMBOLS = 20
+
+# Shared HTTP session and worker pool for direct Yahoo requests
+_session = requests.Session()
+_session.headers.update({
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+})
+_executor = ThreadPoolExecutor(max_workers=4)
+
+# yf.Ticker objects are reused per symbol - construction sets up session/cookie state
+_TICKERS = {}
+
 # Mapping of IG epics to Yahoo Finance tickers
 EPIC_TO_YAHOO = {
     # Commodities
@@ -67,6 +83,13 @@ def get_timeframe_period(timeframe):
     }
     return period_map.get(timeframe, "1y")
 
+def _ticker(symbol):
+    """Get a cached yf.Ticker for a symbol (at worst two threads build one each)"""
+    ticker = _TICKERS.get(symbol)
+    if ticker is None:
+        ticker = _TICKERS.setdefault(symbol, yf.Ticker(symbol))
+    return ticker
+
 def get_historical_range(ticker, period="1y"):
     """
     Get high and low for a period from Yahoo Finance
@@ -79,7 +102,7 @@ def get_historical_range(ticker, period="1y"):
         dict with 'high', 'low', 'num_candles', 'start_date', 'end_date' or None
     """
     try:
-        stock = yf.Ticker(ticker)
+        stock = _ticker(ticker)
         hist = stock.history(period=period)
         
         if hist.empty:
@@ -114,7 +137,7 @@ def get_current_price(ticker):
         float: Current price or None if failed
     """
     try:
-        stock = yf.Ticker(ticker)
+        stock = _ticker(ticker)
         
         # Try to get real-time price first
         info = stock.info
@@ -138,33 +161,128 @@ def get_current_price(ticker):
         print(f"Yahoo current price error for {ticker}: {str(e)}")
         return None
 
-def test_yahoo_data(epic):
-    """Test function to verify Yahoo data for an epic"""
-    ticker = get_yahoo_ticker(epic)
-    if not ticker:
-        print(f"No Yahoo ticker for {epic}")
-        return
-    
-    print(f"\nTesting {epic} -> {ticker}")
-    
-    # Get historical
-    data = get_historical_range(ticker, "1y")
-    if data:
-        print(f"✓ Annual High: {data['high']:.2f}")
-        print(f"✓ Annual Low: {data['low']:.2f}")
-        print(f"✓ Candles: {data['num_candles']}")
-    else:
-        print("✗ No historical data")
-    
-    # Get current
-    current = get_current_price(ticker)
-    if current:
-        print(f"✓ Current Price: {current:.2f}")
-    else:
-        print("✗ No current price")
+def _spark_chunk(tickers):
+    """Fetch current prices for up to SPARK_MAX_SYMBOLS tickers in one spark call"""
+    params = {
+        "symbols": ",".join(tickers[:SPARK_MAX_SYMBOLS]),
+        "range": "1d",
+        "interval": "5m",
+        "indicators": "close"
+    }
+    
+    try:
+        response = _session.get(SPARK_URL, params=params, timeout=5)
+        response.raise_for_status()
+        data = response.json().get('spark', {}).get('result') or []
+        
+        prices = {}
+        for row in data:
+            try:
+                price = row['response'][0]['meta']['regularMarketPrice']
+            except (KeyError, IndexError, TypeError):
+                continue
+            if price is not None:
+                prices[row['symbol']] = float(price)
+        return prices
+        
+    except Exception as e:
+        print(f"Yahoo spark error for {','.join(tickers)}: {str(e)}")
+        return {}
+
+def spark_bulk_current(tickers):
+    """
+    Get current prices for many tickers via Yahoo's spark endpoint (bypasses yfinance)
+    
+    Args:
+        tickers: list of Yahoo Finance ticker symbols
+    
+    Returns:
+        dict of {ticker: price} - tickers with no price are left out
+    """
+    tickers = list(dict.fromkeys(t for t in tickers if t))
+    chunks = [tickers[i:i + SPARK_MAX_SYMBOLS] for i in range(0, len(tickers), SPARK_MAX_SYMBOLS)]
+    
+    prices = {}
+    for chunk_prices in _executor.map(_spark_chunk, chunks):
+        prices.update(chunk_prices)
+    return prices
+
+def get_current_prices_for_epics(epics=None):
+    """
+    Get current Yahoo prices keyed by IG epic
+    
+    Args:
+        epics: list of IG epics (default: every epic in EPIC_TO_YAHOO)
+    
+    Returns:
+        dict of {epic: price} for epics with a Yahoo ticker and a price
+    """
+    if epics is None:
+        epics = list(EPIC_TO_YAHOO)
+    
+    tickers = {epic: get_yahoo_ticker(epic) for epic in epics}
+    prices = spark_bulk_current([t for t in tickers.values() if t])
+    
+    return {epic: prices[t] for epic, t in tickers.items() if t in prices}
+
+def get_historical_range_batch(tickers, period="1y"):
+    """
+    Get historical ranges for several tickers concurrently
+    
+    Returns:
+        dict of {ticker: range dict or None} (see get_historical_range)
+    """
+    tickers = list(dict.fromkeys(t for t in tickers if t))
+    results = _executor.map(lambda t: get_historical_range(t, period), tickers)
+    return dict(zip(tickers, results))
+
+def get_current_price_batch(tickers):
+    """
+    Get current prices for several tickers - one spark call per 20 tickers,
+    falling back to get_current_price for any the spark endpoint missed
+    
+    Returns:
+        dict of {ticker: price or None}
+    """
+    tickers = list(dict.fromkeys(t for t in tickers if t))
+    prices = spark_bulk_current(tickers)
+    
+    missing = [t for t in tickers if t not in prices]
+    for ticker, price in zip(missing, _executor.map(get_current_price, missing)):
+        prices[ticker] = price
+    
+    return {t: prices.get(t) for t in tickers}
+
+def test_yahoo_data(epics):
+    """Test function to verify Yahoo data for a list of epics"""
+    tickers = {}
+    for epic in epics:
+        ticker = get_yahoo_ticker(epic)
+        if ticker:
+            tickers[epic] = ticker
+        else:
+            print(f"No Yahoo ticker for {epic}")
+    
+    historical = get_historical_range_batch(tickers.values(), "1y")
+    current_prices = get_current_price_batch(tickers.values())
+    
+    for epic, ticker in tickers.items():
+        print(f"\nTesting {epic} -> {ticker}")
+        
+        data = historical.get(ticker)
+        if data:
+            print(f"✓ Annual High: {data['high']:.2f}")
+            print(f"✓ Annual Low: {data['low']:.2f}")
+            print(f"✓ Candles: {data['num_candles']}")
+        else:
+            print("✗ No historical data")
+        
+        current = current_prices.get(ticker)
+        if current:
+            print(f"✓ Current Price: {current:.2f}")
+        else:
+            print("✗ No current price")
 
 if __name__ == "__main__":
-    # Test with gold
-    test_yahoo_data('CS.D.USCGC.TODAY.IP')
-    test_yahoo_data('IX.D.SPTRD.DAILY.IP')
-    test_yahoo_data('IX.D.RUSSELL.DAILY.IP')
\ No newline at end of file
+    # Test with gold and two indices
+    test_yahoo_data(['CS.D.USCGC.TODAY.IP', 'IX.D.SPTRD.DAILY.IP', 'IX.D.RUSSELL.DAILY.IP'])
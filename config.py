@@ -72,4 +72,4 @@ class Config:
     def has_credentials(self, account_type):
         """Check if credentials exist for account type"""
         creds = self.get_credentials(account_type)
-        return all([creds['username'], creds['password'], creds['api_key']])
\ No newline at end of file
+        return bool(creds['username'] and creds['password'] and creds['api_key'])
\ No newline at end of file
@@ -8,6 +8,7 @@ from trading import risk_manager
 from trading.auto_strategy import AutoStrategy  
 from trading.ladder_strategy import LadderStrategy
 from trading.risk_manager import RiskManager  # Add this import
+from trading.price_cache import PriceCache
 from ui.main_window import MainWindow
 
 def main():
@@ -15,9 +16,10 @@ def main():
     # Initialize components
     config = Config()
     ig_client = IGClient()
-    ladder_strategy = LadderStrategy(ig_client)
-    auto_strategy = AutoStrategy(ig_client, ladder_strategy) 
-    risk_manager = RiskManager(ig_client)  # Initialize RiskManager
+    price_cache = PriceCache(ig_client)  # One cache so the strategies and risk checks share price requests
+    ladder_strategy = LadderStrategy(ig_client, price_cache)
+    auto_strategy = AutoStrategy(ig_client, ladder_strategy, price_cache)
+    risk_manager = RiskManager(ig_client, price_cache)  # Initialize RiskManager
     
     # Create and run GUI
     window = MainWindow(config, ig_client, ladder_strategy, auto_strategy, risk_manager)
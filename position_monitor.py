@@ -4,13 +4,115 @@ Watches for working orders becoming positions and auto-attaches stops/limits
 Now includes VERIFICATION logic - checks if stops exist, adds if missing
 FIXED: Retry mechanism for None levels, better trailing logic
 """
+import functools
+import json
+import os
+import queue
+import sys
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Optional
+from api.ig_client import RateLimitError
+from api.rate_limiter import TokenBucket
+
+STATE_DIR = os.path.dirname(os.path.abspath(__file__))  # Project root, whatever the working directory
+
+
+def _intern_id(deal_id):
+    """Intern a deal ID so set/dict lookups across cycles hit the cached hash and compare by identity"""
+    return sys.intern(deal_id) if deal_id else deal_id
+
+
+def _index_by_deal_id(items, key):
+    """Map dealId -> item in one pass (key is "position" or "workingOrderData")"""
+    by_id = {}
+    for item in items:
+        data = item.get(key)
+        if data:
+            deal_id = data.get("dealId")
+            if deal_id:
+                by_id[sys.intern(deal_id)] = item
+    return by_id
+
+
+@dataclass(frozen=True, slots=True)
+class PositionSnapshot:
+    """The fields the monitor reads from an open position"""
+    deal_id: str
+    epic: Optional[str]
+    instrument_name: Optional[str]
+    direction: Optional[str]
+    open_level: Optional[float]
+    stop_level: Optional[float]
+    size: Optional[float]
+
+
+def _snapshot(raw):
+    """Build a PositionSnapshot from a /positions entry"""
+    position_data = raw.get("position") or {}
+    market_data = raw.get("market") or {}
+    epic = market_data.get("epic")
+    return PositionSnapshot(
+        deal_id=_intern_id(position_data.get("dealId")),
+        epic=epic,
+        instrument_name=market_data.get("instrumentName", epic),
+        direction=position_data.get("direction"),
+        open_level=position_data.get("openLevel"),  # FIXED: positions use openLevel
+        stop_level=position_data.get("stopLevel"),
+        size=position_data.get("dealSize")
+    )
+
+
+def _snapshots_by_deal_id(positions):
+    """Convert a /positions response into {deal_id: PositionSnapshot}"""
+    return {deal_id: _snapshot(raw) for deal_id, raw in _index_by_deal_id(positions, "position").items()}
+
+
+def _compute_target(direction, level, distance, is_limit):
+    """Stop/limit level for a position - stops sit against the trade, limits in its favour"""
+    sign = 1 if (direction == "BUY") == is_limit else -1
+    return level + sign * distance
+
+
+def _log_errors(message, default=None):
+    """Log a monitor method's exceptions as "<message>: <error>" and return default instead
+    
+    RateLimitError is re-raised so the monitor loop can back off.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            except RateLimitError:
+                raise
+            except Exception as e:
+                if self.log_func:
+                    self.log_func(f"{message}: {e}")
+                return default
+        return wrapper
+    return decorator
+
 
 class PositionMonitor:
     """Monitors positions and auto-attaches stops when orders fill"""
     
+    __slots__ = (
+        "ig_client", "running", "monitor_thread", "log_func",
+        "known_positions", "known_working_orders", "pending_retries",
+        "auto_stop_enabled", "auto_stop_distance", "verify_stops",
+        "auto_trailing_enabled", "trailing_distance", "trailing_step",
+        "auto_limit_enabled", "auto_limit_distance",
+        "check_interval", "min_interval", "max_interval", "reconcile_interval", "price_cache_ttl",
+        "max_retries", "max_backoff", "rate_limit_backoff", "state_file",
+        "_wake", "_stop_evt", "_state_lock", "_saw_fill", "_idle_interval", "_trade_subscription", "_rate_limiter", "_price_cache",
+        "_stop_distance", "_limit_distance", "_trailing_summary", "_limit_summary", "_verified_stops", "_last_fp",
+        "_last_update", "_pending_trail", "trail_debounce", "_position_steps", "_streamed_positions",
+    )
+    
     def __init__(self, ig_client):
         self.ig_client = ig_client
         self.running = False
@@ -18,6 +120,9 @@ class PositionMonitor:
         self.known_positions = set()  # Track position deal IDs we've already processed
         self.known_working_orders = set()  # Track working order deal IDs
         self.pending_retries = {}  # Track positions waiting for level to populate: {deal_id: retry_count}
+        self._verified_stops = set()  # Deal IDs whose stop has been confirmed or attached
+        self._state_lock = threading.RLock()  # Guards the collections above across threads
+        self.state_file = os.path.join(STATE_DIR, "position_monitor_state.json")  # Survives restarts so unverified positions get re-checked
         
         # Configuration
         self.auto_stop_enabled = True  # Default ON for safety
@@ -27,12 +132,33 @@ class PositionMonitor:
         self.auto_trailing_enabled = False
         self.trailing_distance = 15
         self.trailing_step = 5
+        self.trail_debounce = 5  # Seconds a small trailing move must hold before it is sent
         
         self.auto_limit_enabled = False
         self.auto_limit_distance = 10
         
         self.check_interval = 10  # Check every 10 seconds
-        self.max_retries = 5  # Try 5 times before giving up (50 seconds total)
+        self.min_interval = 5  # Sprint interval while fills are in flight - leaves room in the 30 req/min budget
+        self.max_interval = 30  # Idle interval ramps up to this when nothing is happening
+        self.reconcile_interval = 60  # REST re-check interval while the trade stream is healthy
+        self.price_cache_ttl = 0.5  # Reuse a market price fetched within this many seconds
+        self.max_retries = 10  # Try 10 times before giving up (50 seconds total at min_interval)
+        self.max_backoff = 300  # Longest wait after repeated failures (seconds)
+        self.rate_limit_backoff = 30  # Minimum base wait after an IG rate-limit rejection
+        
+        self.log_func = None
+        self._wake = threading.Event()  # Set by notify() to run a check immediately
+        self._stop_evt = threading.Event()  # Set by stop() - cuts short a wait for the request budget
+        self._saw_fill = False  # A new position was seen on the last check
+        self._idle_interval = self.check_interval
+        self._trade_subscription = None  # Lightstreamer TRADE subscription (None = polling only)
+        self._streamed_positions = queue.SimpleQueue()  # New positions from the stream, processed on the monitor thread
+        self._rate_limiter = TokenBucket(rate=30 / 60, capacity=10)  # IG non-trading allowance: 30 req/min
+        self._price_cache = {}  # {epic: (fetched_at, price_data)}
+        self._pending_trail = {}  # {deal_id: first_seen} small trailing moves waiting to be reconfirmed
+        self._last_update = {}  # {deal_id: (stop_level, limit_level)} accepted by IG during the current processing pass
+        self._last_fp = None  # Fingerprint of (deal_id, stop_level) pairs seen on the last check
+        self._prepare_attach_params()
         
     def configure(self, auto_stop=True, stop_distance=20, verify_stops=True,
                   auto_trailing=False, trailing_distance=15, trailing_step=5,
@@ -48,6 +174,60 @@ class PositionMonitor:
         
         self.auto_limit_enabled = auto_limit
         self.auto_limit_distance = limit_distance
+        
+        self._prepare_attach_params()
+    
+    def _prepare_attach_params(self):
+        """Precompute attach distances and log messages - these only change on configure()"""
+        self._stop_distance = self.auto_stop_distance if self.auto_stop_enabled else None
+        self._limit_distance = self.auto_limit_distance if self.auto_limit_enabled else None
+        
+        if self.auto_trailing_enabled:
+            self._trailing_summary = f"🔄 Trailing enabled ({self.trailing_distance}pts distance, {self.trailing_step}pts step)"
+        else:
+            self._trailing_summary = None
+        self._limit_summary = f"✅ Limit added @ {self.auto_limit_distance}pts"
+        
+        # Steps run on each new position - disabled features are left out rather than re-checked per fill
+        steps = [self._verify_stop if self.verify_stops else self._mark_verified]
+        if self._trailing_summary:
+            steps.append(self._log_trailing)
+        if self._limit_distance is not None:
+            steps.append(self._add_limit)
+        self._position_steps = tuple(steps)
+    
+    def _load_state(self):
+        """Load verified stops and pending retries saved by a previous run
+        
+        Returns:
+            True if a state file was loaded
+        """
+        if not os.path.exists(self.state_file):
+            return False
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            with self._state_lock:
+                self._verified_stops = set(map(_intern_id, state.get("verified", [])))
+                self.pending_retries = {_intern_id(d): n for d, n in state.get("pending", {}).items()}
+            return True
+        except Exception as e:
+            if self.log_func:
+                self.log_func(f"Warning: Could not load position monitor state: {e}")
+            return False
+    
+    def _save_state(self):
+        """Write verified stops and pending retries to disk (temp file + rename so it is never half-written)"""
+        with self._state_lock:
+            state = {"verified": sorted(self._verified_stops), "pending": dict(self.pending_retries)}
+        try:
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            if self.log_func:
+                self.log_func(f"Warning: Could not save position monitor state: {e}")
     
     def start(self, log_func):
         """Start monitoring positions"""
@@ -57,348 +237,528 @@ class PositionMonitor:
         
         self.running = True
         self.log_func = log_func
+        self._wake.clear()
+        self._stop_evt.clear()
+        self._last_fp = None
         
         # Initialize known positions and orders
         try:
-            positions = self.ig_client.get_open_positions()
-            self.known_positions = {p.get("position", {}).get("dealId") for p in positions if p.get("position", {}).get("dealId")}
-            
+            positions = self.ig_client.get_open_positions(raise_on_error=True)
             working_orders = self.ig_client.get_working_orders()
-            self.known_working_orders = {o.get("workingOrderData", {}).get("dealId") for o in working_orders if o.get("workingOrderData", {}).get("dealId")}
             
+            with self._state_lock:
+                self.known_working_orders = set(_index_by_deal_id(working_orders, "workingOrderData"))
+            self._seed_known_positions(set(_snapshots_by_deal_id(positions)))
             log_func(f"📊 Position monitor started - tracking {len(self.known_positions)} positions, {len(self.known_working_orders)} orders")
         except Exception as e:
-            log_func(f"Warning: Could not initialize position tracking: {e}")
-            self.known_positions = set()
-            self.known_working_orders = set()
+            log_func(f"Warning: Could not initialize position tracking: {e} - will retry on the first check")
+            with self._state_lock:
+                self.known_positions = None  # Seeded by the first successful check, not treated as all-new
+                self.known_working_orders = set()
+        
+        # Get fills pushed from the trade stream - REST polling becomes a slower reconciliation
+        self._trade_subscription = self.ig_client.subscribe_trade_stream(on_opu=self._on_opu, on_wou=self._on_wou)
+        if self._trade_subscription is not None:
+            log_func(f"📡 Trade stream subscribed - reconciling via REST every {self.reconcile_interval}s")
         
         # Start monitoring thread
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
     
+    def _seed_known_positions(self, current_ids):
+        """Take the positions already open when monitoring starts as known"""
+        with self._state_lock:
+            loaded = self._load_state()
+            if loaded:
+                # Forget positions closed since the state was saved, so a reused deal ID isn't taken as verified
+                stale = (self._verified_stops | self.pending_retries.keys()) - current_ids
+                self._verified_stops &= current_ids
+                for deal_id in stale:
+                    self.pending_retries.pop(deal_id, None)
+                
+                # Only positions verified before the restart count as known -
+                # the first check re-verifies the rest instead of trusting them
+                self.known_positions = current_ids & self._verified_stops
+            else:
+                self.known_positions = set(current_ids)
+            unverified = len(current_ids) - len(self.known_positions)
+        
+        if loaded and stale:
+            self._save_state()
+        if unverified and self.log_func:
+            self.log_func(f"🔍 {unverified} position(s) not verified before restart - checking stops now")
+    
     def stop(self):
         """Stop monitoring positions"""
         self.running = False
+        self._stop_evt.set()
+        self._wake.set()
+        
+        if self._trade_subscription is not None:
+            self.ig_client.unsubscribe_stream(self._trade_subscription)
+            self._trade_subscription = None
+        
         if self.log_func:
             self.log_func("Position monitor stopped")
     
     def _monitor_loop(self):
-        """Main monitoring loop"""
+        """Main monitoring loop - backs off exponentially on consecutive failures"""
+        fail_count = 0
+        
         while self.running:
             try:
+                self._process_streamed_positions()
                 self._check_positions()
-                time.sleep(self.check_interval)
+                fail_count = 0
+                delay = self._poll_interval()
+            except RateLimitError:
+                # Always back off on rate limits, even with a short check interval
+                base = max(self.check_interval, self.rate_limit_backoff)
+                delay = min(base * (2 ** fail_count), self.max_backoff)
+                fail_count += 1
+                if self.log_func:
+                    self.log_func(f"⏳ IG rate limit hit - backing off {delay}s")
             except Exception as e:
+                delay = min(self.check_interval * (2 ** fail_count), self.max_backoff)
+                fail_count += 1
                 if self.log_func:
-                    self.log_func(f"Position monitor error: {e}")
-                time.sleep(self.check_interval)
+                    self.log_func(f"Position monitor error: {e} - retrying in {delay}s")
+            
+            # Sleep until the next check, or until notify()/stop() wakes us early. Cleared before the
+            # next check runs, so a notify() landing during that check still cuts the following wait short
+            if self._wake.wait(delay):
+                self._wake.clear()
+    
+    def notify(self):
+        """Wake the monitor loop now - call on position/order events (e.g. a fill)"""
+        self._wake.set()
+    
+    def _stream_healthy(self):
+        """Check if position updates are arriving from the trade stream"""
+        return self._trade_subscription is not None and self.ig_client.is_stream_connected()
+    
+    def _poll_interval(self):
+        """Seconds until the next REST check - sprint while fills are in flight, relax when idle"""
+        if self.pending_retries or self._saw_fill:
+            self._idle_interval = self.check_interval
+            return self.min_interval
+        
+        if self.auto_trailing_enabled:
+            return self.check_interval  # Trailing still needs regular price checks
+        
+        if self._stream_healthy():
+            return self.reconcile_interval
+        
+        # Nothing happening - ramp the interval up towards max_interval
+        interval = self._idle_interval
+        self._idle_interval = min(self._idle_interval * 2, self.max_interval)
+        return interval
+    
+    def _on_opu(self, update):
+        """Handle an Open Position Update pushed from the trade stream"""
+        deal_id = _intern_id(update.get("dealId"))
+        if not deal_id or update.get("dealStatus") != "ACCEPTED":
+            return
+        
+        status = update.get("status")
+        with self._state_lock:
+            if self.known_positions is None:
+                return  # Not seeded yet - the first successful check picks this position up
+            if status == "DELETED":
+                self.known_positions.discard(deal_id)
+                return
+            if status != "OPEN" or deal_id in self.known_positions:
+                return
+            self.known_positions.add(deal_id)
+        
+        self._saw_fill = True
+        
+        # Attaching stops makes REST calls - hand the position to the monitor thread
+        # rather than blocking the Lightstreamer callback thread
+        epic = update.get("epic")
+        self._streamed_positions.put(PositionSnapshot(
+            deal_id=deal_id,
+            epic=epic,
+            instrument_name=epic,
+            direction=update.get("direction"),
+            open_level=update.get("level"),
+            stop_level=update.get("stopLevel"),
+            size=update.get("size")
+        ))
+        self.notify()
+    
+    def _process_streamed_positions(self):
+        """Process the new positions _on_opu queued from the trade stream"""
+        while True:
+            try:
+                position = self._streamed_positions.get_nowait()
+            except queue.Empty:
+                return
+            self.log_func(f"🔔 Stream: new position {position.deal_id}")
+            self._process_new_position(position)
+    
+    def _on_wou(self, update):
+        """Handle a Working Order Update pushed from the trade stream"""
+        deal_id = _intern_id(update.get("dealId"))
+        if not deal_id or update.get("dealStatus") != "ACCEPTED":
+            return
+        
+        if update.get("status") == "DELETED":
+            # Order filled or cancelled - a fill shows up as an OPU, so just reconcile now
+            with self._state_lock:
+                self.known_working_orders.discard(deal_id)
+            self.notify()
+        else:
+            with self._state_lock:
+                self.known_working_orders.add(deal_id)
     
     def _check_positions(self):
-        """Check for new positions and manage them"""
-        try:
-            # Get current positions
-            current_positions = self.ig_client.get_open_positions()
-            current_position_ids = {p.get("position", {}).get("dealId") for p in current_positions if p.get("position", {}).get("dealId")}
-            
-            # Detect NEW positions (orders that just filled)
+        """Check for new positions and manage them - errors propagate so _monitor_loop can back off"""
+        # Get current positions
+        # Raises on a failed request - an empty result must mean no positions, or the
+        # reconciliation below would forget every known position and re-process them all
+        # Polls share the non-trading budget with the stop/limit updates
+        if not self._rate_limiter.acquire(cancel=self._stop_evt):
+            return  # Stopped while waiting for the request budget
+        current_positions = self.ig_client.get_open_positions(raise_on_error=True)
+        positions_by_id = _snapshots_by_deal_id(current_positions)
+        
+        # Nothing opened, closed or had its stop moved since last time - skip the diff
+        fp = hash(frozenset((deal_id, p.stop_level) for deal_id, p in positions_by_id.items()))
+        if fp == self._last_fp and not self.pending_retries:
+            self._saw_fill = False
+            if self.auto_trailing_enabled:
+                self._update_trailing_stops(positions_by_id.values())  # Prices still move
+            return
+        self._last_fp = fp
+        
+        current_position_ids = set(positions_by_id)
+        if self.known_positions is None:
+            self._seed_known_positions(current_position_ids)
+        
+        # Detect NEW positions (orders that just filled) and update known positions
+        # in one step - single assignment so closed positions drop out too
+        with self._state_lock:
             new_position_ids = current_position_ids - self.known_positions
+            self.known_positions = current_position_ids
+            closed_ids = self._verified_stops - current_position_ids
+            self._verified_stops -= closed_ids
+        self._saw_fill = bool(new_position_ids)
+        
+        if closed_ids:
+            self._save_state()
+        
+        if new_position_ids:
+            self.log_func(f"🔔 Detected {len(new_position_ids)} new position(s)")
             
-            if new_position_ids:
-                self.log_func(f"🔔 Detected {len(new_position_ids)} new position(s)")
-                
-                for position in current_positions:
-                    deal_id = position.get("position", {}).get("dealId")
-                    if deal_id in new_position_ids:
-                        self._process_new_position(position)
-                
-                # Update known positions
-                self.known_positions = current_position_ids
-            
-            # Retry any pending positions that had None level
-            if self.pending_retries:
-                self._retry_pending_positions(current_positions)
-            
-            # Handle trailing for existing positions
-            if self.auto_trailing_enabled:
-                self._update_trailing_stops(current_positions)
-                
-        except Exception as e:
-            if self.log_func:
-                self.log_func(f"Error checking positions: {e}")
+            for deal_id in new_position_ids:
+                self._process_new_position(positions_by_id[deal_id])
+        
+        # Retry any pending positions that had None level
+        if self.pending_retries:
+            self._retry_pending_positions(positions_by_id)
+        
+        # Handle trailing for existing positions
+        if self.auto_trailing_enabled:
+            self._update_trailing_stops(positions_by_id.values())
     
-    def _retry_pending_positions(self, current_positions):
+    def _retry_pending_positions(self, positions_by_id):
         """Retry attaching stops/limits to positions that had None level"""
-        completed = []
+        completed = set()
+        bumps = {}
+        
+        # Snapshot under the lock, then work without holding it
+        with self._state_lock:
+            pending = tuple(self.pending_retries.items())
         
-        for deal_id, retry_count in list(self.pending_retries.items()):
+        for deal_id, retry_count in pending:
             # Find the position
-            position = next((p for p in current_positions if p.get("position", {}).get("dealId") == deal_id), None)
+            position = positions_by_id.get(deal_id)
             
             if not position:
                 # Position closed or not found
-                completed.append(deal_id)
+                completed.add(deal_id)
                 continue
             
-            position_data = position.get("position", {})
-            level = position_data.get("openLevel")  # FIXED: positions use openLevel
+            level = position.open_level
             
             if level is not None:
                 # Level populated! Try attaching stop/limit again
                 self.log_func(f"🔄 Retry #{retry_count}: Position {deal_id} now has level {level}")
                 self._process_new_position(position)
-                completed.append(deal_id)
+                completed.add(deal_id)
             elif retry_count >= self.max_retries:
                 # Give up after max retries
                 self.log_func(f"❌ Gave up on position {deal_id} after {self.max_retries} retries - level still None")
-                completed.append(deal_id)
+                completed.add(deal_id)
             else:
                 # Increment retry count
-                self.pending_retries[deal_id] = retry_count + 1
+                bumps[deal_id] = retry_count + 1
         
-        # Remove completed retries
-        for deal_id in completed:
-            del self.pending_retries[deal_id]
+        # Write back retry counts and remove completed retries
+        with self._state_lock:
+            self.pending_retries.update(bumps)
+            for deal_id in completed:
+                self.pending_retries.pop(deal_id, None)
+        
+        if completed:
+            self._save_state()
     
+    @_log_errors("Error processing new position")
     def _process_new_position(self, position):
         """Process a newly opened position"""
-        try:
-            position_data = position.get("position", {})
-            market_data = position.get("market", {})
-            
-            deal_id = position_data.get("dealId")
-            epic = market_data.get("epic")
-            instrument_name = market_data.get("instrumentName", epic)
-            direction = position_data.get("direction")
-            size = position_data.get("dealSize")
-            level = position_data.get("openLevel")  # FIXED: positions use openLevel
-            
-            # Check current stop level
-            current_stop = position_data.get("stopLevel")
-            
-            # Check if level is None - schedule retry
-            if level is None:
-                if deal_id not in self.pending_retries:
-                    self.log_func(f"📍 Processing new position: {instrument_name} {direction} {size} @ None")
-                    self.log_func(f"⏳ Position level is None - will retry in {self.check_interval}s")
+        deal_id = position.deal_id
+        instrument_name = position.instrument_name
+        direction = position.direction
+        size = position.size
+        level = position.open_level
+        
+        # Check if level is None - schedule retry
+        if level is None:
+            with self._state_lock:
+                is_new_retry = deal_id not in self.pending_retries
+                if is_new_retry:
                     self.pending_retries[deal_id] = 1
-                return
-            
-            self.log_func(f"📍 Processing new position: {instrument_name} {direction} {size} @ {level}")
-            
-            # VERIFY stop exists (safety check)
-            if self.verify_stops:
-                if current_stop is None or current_stop == 0:
-                    # NO STOP - this is dangerous! Add one immediately
-                    self.log_func(f"⚠️ WARNING: Position {deal_id} has NO stop loss!")
-                    
-                    if self.auto_stop_enabled:
-                        success = self._attach_stop(position, self.auto_stop_distance)
-                        if success:
-                            self.log_func(f"✅ Emergency stop added to {deal_id}")
-                        else:
-                            self.log_func(f"❌ FAILED to add stop to {deal_id} - MANUALLY ADD STOP!")
-                    else:
-                        self.log_func(f"❌ Auto-stop disabled - position has NO protection!")
-                else:
-                    # Stop exists - good!
-                    self.log_func(f"✅ Position has stop @ {current_stop}")
-            
-            # Add trailing if enabled
-            if self.auto_trailing_enabled and current_stop:
-                self.log_func(f"🔄 Trailing enabled ({self.trailing_distance}pts distance, {self.trailing_step}pts step)")
-                # Trailing will be handled by _update_trailing_stops
+            if is_new_retry:
+                self._save_state()
+                self.log_func(f"📍 Processing new position: {instrument_name} {direction} {size} @ None")
+                self.log_func(f"⏳ Position level is None - will retry in {self.min_interval}s")
+            return
+        
+        self.log_func(f"📍 Processing new position: {instrument_name} {direction} {size} @ {level}")
+        
+        # The memo only saves repeat calls within this pass - trailing, bulk and manual edits can
+        # change the levels afterwards, so a later pass must ask IG again
+        try:
+            for step in self._position_steps:
+                step(position)
+        finally:
+            with self._state_lock:
+                self._last_update.pop(deal_id, None)
+    
+    def _verify_stop(self, position):
+        """VERIFY stop exists (safety check) - adds an emergency stop if it is missing"""
+        deal_id = position.deal_id
+        current_stop = position.stop_level
+        
+        if current_stop is None or current_stop == 0:
+            # NO STOP - this is dangerous! Add one immediately
+            self.log_func(f"⚠️ WARNING: Position {deal_id} has NO stop loss!")
             
-            # Add limit if enabled
-            if self.auto_limit_enabled:
-                success = self._attach_limit(position, self.auto_limit_distance)
+            if self._stop_distance is not None:
+                success = self._attach_stop(position, self._stop_distance)
                 if success:
-                    self.log_func(f"✅ Limit added @ {self.auto_limit_distance}pts")
+                    self._mark_verified(position)
+                    self.log_func(f"✅ Emergency stop added to {deal_id}")
                 else:
-                    self.log_func(f"⚠️ Could not add limit")
-                    
-        except Exception as e:
-            self.log_func(f"Error processing new position: {e}")
+                    self.log_func(f"❌ FAILED to add stop to {deal_id} - MANUALLY ADD STOP!")
+            else:
+                self.log_func(f"❌ Auto-stop disabled - position has NO protection!")
+        else:
+            # Stop exists - good!
+            self._mark_verified(position)
+            self.log_func(f"✅ Position has stop @ {current_stop}")
     
+    def _mark_verified(self, position):
+        """Record that position has a stop so a restart doesn't re-check it"""
+        with self._state_lock:
+            self._verified_stops.add(position.deal_id)
+        self._save_state()
+    
+    def _log_trailing(self, position):
+        """Trailing itself is handled by _update_trailing_stops"""
+        if position.stop_level:
+            self.log_func(self._trailing_summary)
+    
+    def _add_limit(self, position):
+        """Add limit if enabled"""
+        success = self._attach_limit(position, self._limit_distance)
+        if success:
+            self.log_func(self._limit_summary)
+        else:
+            self.log_func(f"⚠️ Could not add limit")
+    
+    def _attach(self, position, distance, is_limit):
+        """Attach a stop or limit to position - skipped if IG accepted that exact level earlier in this pass"""
+        level = position.open_level
+        
+        # Check if level exists
+        if level is None:
+            return False
+        
+        deal_id = position.deal_id
+        target = _compute_target(position.direction, level, distance, is_limit)
+        last_stop, last_limit = self._last_update.get(deal_id, (None, None))
+        if target == (last_limit if is_limit else last_stop):
+            return True
+        
+        success, message = self.ig_client.update_position(
+            deal_id=deal_id,
+            stop_level=None if is_limit else target,
+            stop_distance=None,
+            limit_level=target if is_limit else None
+        )
+        
+        if success:
+            with self._state_lock:
+                self._last_update[deal_id] = (last_stop, target) if is_limit else (target, last_limit)
+        return success
+    
+    @_log_errors("Error attaching stop", default=False)
     def _attach_stop(self, position, stop_distance):
         """Attach stop loss to position"""
-        try:
-            position_data = position.get("position", {})
-            deal_id = position_data.get("dealId")
-            direction = position_data.get("direction")
-            level = position_data.get("openLevel")  # FIXED: positions use openLevel
-            
-            # Check if level exists
-            if level is None:
-                return False
-            
-            # Calculate stop level
-            if direction == "BUY":
-                stop_level = level - stop_distance
-            else:  # SELL
-                stop_level = level + stop_distance
-            
-            # Update position with stop
-            success, message = self.ig_client.update_position(
-                deal_id=deal_id,
-                stop_level=stop_level,
-                stop_distance=None,
-                limit_level=None
-            )
-            
-            return success
-            
-        except Exception as e:
-            self.log_func(f"Error attaching stop: {e}")
-            return False
+        return self._attach(position, stop_distance, is_limit=False)
     
+    @_log_errors("Error attaching limit", default=False)
     def _attach_limit(self, position, limit_distance):
         """Attach limit (profit target) to position"""
-        try:
-            position_data = position.get("position", {})
-            deal_id = position_data.get("dealId")
-            direction = position_data.get("direction")
-            level = position_data.get("openLevel")  # FIXED: positions use openLevel
-            
-            # Check if level exists
-            if level is None:
-                return False
-            
-            # Calculate limit level
-            if direction == "BUY":
-                limit_level = level + limit_distance
-            else:  # SELL
-                limit_level = level - limit_distance
+        return self._attach(position, limit_distance, is_limit=True)
+    
+    def _get_price(self, epic):
+        """Get market price for an epic, reusing a fetch from the last price_cache_ttl seconds"""
+        now = time.monotonic()
+        cached = self._price_cache.get(epic)
+        if cached and now - cached[0] < self.price_cache_ttl:
+            return cached[1]
+        
+        price_data = self.ig_client.get_market_price(epic)
+        if price_data:
+            self._price_cache[epic] = (now, price_data)
+        return price_data
+    
+    def _get_prices(self, epics, max_workers=8):
+        """Get prices for several epics at once - one bulk /markets call, per-epic lookups only for gaps
+        
+        Returns:
+            dict of {epic: price_data}
+        """
+        now = time.monotonic()
+        prices = {}
+        missing = []
+        for epic in epics:
+            cached = self._price_cache.get(epic)
+            if cached and now - cached[0] < self.price_cache_ttl:
+                prices[epic] = cached[1]
+            else:
+                missing.append(epic)
+        
+        if len(missing) > 1:
+            for epic, price_data in self.ig_client.get_markets_bulk(missing).items():
+                self._price_cache[epic] = (now, price_data)
+                prices[epic] = price_data
+            missing = [epic for epic in missing if epic not in prices]
+        
+        # Anything the bulk call did not return is fetched individually, overlapping the requests
+        if len(missing) == 1:
+            prices[missing[0]] = self._get_price(missing[0])
+        elif missing:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+                prices.update(zip(missing, executor.map(self._get_price, missing)))
+        
+        return prices
+    
+    @_log_errors("Error updating trailing stops")
+    def _update_trailing_stops(self, positions):
+        """Update trailing stops for all positions (PositionSnapshots) - moves are sent as one batch per cycle"""
+        moves = []  # (deal_id, new_stop, instrument_name, current_stop, direction)
+        
+        # Only positions with a stop and a level can trail
+        positions = [p for p in positions if p.stop_level and p.open_level is not None]
+        prices = self._get_prices({p.epic for p in positions})  # One price lookup per epic this cycle
+        
+        distance = self.trailing_distance
+        step = self.trailing_step
+        now = time.monotonic()
+        still_pending = {}
+        
+        for position in positions:
+            price_data = prices[position.epic]
+            if not price_data or not price_data.get('bid') or not price_data.get('offer'):
+                continue
             
-            # Update position with limit
-            success, message = self.ig_client.update_position(
-                deal_id=deal_id,
-                stop_level=None,
-                stop_distance=None,
-                limit_level=limit_level
-            )
+            # sign is +1 for BUY (stop sits below price and only moves UP)
+            # and -1 for SELL (stop sits above price and only moves DOWN)
+            if position.direction == "BUY":
+                sign, current_price = 1, price_data['bid']
+            else:
+                sign, current_price = -1, price_data['offer']
             
-            return success
+            ideal_stop = current_price - sign * distance
+            improvement = sign * (ideal_stop - position.stop_level)
+            if improvement <= step:
+                continue
             
-        except Exception as e:
-            self.log_func(f"Error attaching limit: {e}")
-            return False
-    
-    def _update_trailing_stops(self, positions):
-        """Update trailing stops for all positions"""
-        try:
-            for position in positions:
-                position_data = position.get("position", {})
-                market_data = position.get("market", {})
-                
-                deal_id = position_data.get("dealId")
-                direction = position_data.get("direction")
-                current_level = position_data.get("openLevel")  # FIXED: positions use openLevel
-                current_stop = position_data.get("stopLevel")
-                epic = market_data.get("epic")
-                instrument_name = market_data.get("instrumentName", epic)
-                
-                if not current_stop or current_level is None:
-                    continue  # No stop to trail or no level
-                
-                # Get current market price
-                price_data = self.ig_client.get_market_price(epic)
-                if not price_data or not price_data.get('bid') or not price_data.get('offer'):
+            # Small moves must be seen again trail_debounce seconds later before they are sent,
+            # so a noisy tick doesn't cost a REST call - big moves go straight out
+            deal_id = position.deal_id
+            if improvement <= 2 * step:
+                first_seen = self._pending_trail.get(deal_id, now)
+                if now - first_seen < self.trail_debounce:
+                    still_pending[deal_id] = first_seen
                     continue
-                
-                current_price = price_data['bid'] if direction == "BUY" else price_data['offer']
-                
-                # Calculate ideal stop level
-                if direction == "BUY":
-                    ideal_stop = current_price - self.trailing_distance
-                    
-                    # Only move stop UP, never down
-                    if ideal_stop > current_stop + self.trailing_step:
-                        new_stop = ideal_stop
-                        
-                        success, message = self.ig_client.update_position(
-                            deal_id=deal_id,
-                            stop_level=new_stop,
-                            stop_distance=None,
-                            limit_level=None
-                        )
-                        
-                        if success:
-                            self.log_func(f"🔄 {instrument_name}: Trailed stop UP {current_stop:.2f} → {new_stop:.2f}")
-                        else:
-                            self.log_func(f"❌ Failed to trail stop: {message}")
-                        
-                else:  # SELL
-                    ideal_stop = current_price + self.trailing_distance
-                    
-                    # Only move stop DOWN, never up
-                    if ideal_stop < current_stop - self.trailing_step:
-                        new_stop = ideal_stop
-                        
-                        success, message = self.ig_client.update_position(
-                            deal_id=deal_id,
-                            stop_level=new_stop,
-                            stop_distance=None,
-                            limit_level=None
-                        )
-                        
-                        if success:
-                            self.log_func(f"🔄 {instrument_name}: Trailed stop DOWN {current_stop:.2f} → {new_stop:.2f}")
-                        else:
-                            self.log_func(f"❌ Failed to trail stop: {message}")
-                            
-        except Exception as e:
-            if self.log_func:
-                self.log_func(f"Error updating trailing stops: {e}")
+            
+            moves.append((deal_id, ideal_stop, position.instrument_name, position.stop_level, position.direction))
+        
+        # Candidates that weren't reconfirmed this cycle are dropped
+        self._pending_trail = still_pending
+        
+        if not moves:
+            return
+        
+        results = self.ig_client.update_positions_batch(
+            [{"deal_id": deal_id, "stop_level": new_stop} for deal_id, new_stop, _, _, _ in moves],
+            rate_limiter=self._rate_limiter
+        )
+        
+        for (deal_id, new_stop, instrument_name, current_stop, direction), (success, message) in zip(moves, results):
+            if success:
+                arrow = "UP" if direction == "BUY" else "DOWN"
+                self.log_func(f"🔄 {instrument_name}: Trailed stop {arrow} {current_stop:.2f} → {new_stop:.2f}")
+            else:
+                self.log_func(f"❌ Failed to trail stop: {message}")
     
+    @_log_errors("Error in bulk update", default=False)
     def bulk_update_stops(self, stop_distance):
         """Update stop distance on ALL open positions"""
-        try:
-            positions = self.ig_client.get_open_positions()
-            updated = 0
-            failed = 0
-            
-            self.log_func(f"🔄 Updating stops on {len(positions)} positions to {stop_distance}pts...")
+        positions = self.ig_client.get_open_positions()
+        updated = 0
+        failed = 0
+        
+        self.log_func(f"🔄 Updating stops on {len(positions)} positions to {stop_distance}pts...")
+        
+        # Work out every new stop first, then send the updates as one batch
+        jobs = []
+        for position in map(_snapshot, positions):
+            deal_id = position.deal_id
+            direction = position.direction
+            level = position.open_level
+            instrument_name = position.instrument_name or ""
             
-            for position in positions:
-                position_data = position.get("position", {})
-                market_data = position.get("market", {})
-                
-                deal_id = position_data.get("dealId")
-                direction = position_data.get("direction")
-                level = position_data.get("openLevel")  # FIXED: positions use openLevel
-                instrument_name = market_data.get("instrumentName", "")
-                
-                if level is None:
-                    self.log_func(f"⚠️ Skipping {instrument_name} - no level")
-                    failed += 1
-                    continue
-                
-                # Calculate new stop level
-                if direction == "BUY":
-                    new_stop = level - stop_distance
-                else:  # SELL
-                    new_stop = level + stop_distance
-                
-                # Update position
-                success, message = self.ig_client.update_position(
-                    deal_id=deal_id,
-                    stop_level=new_stop,
-                    stop_distance=None,
-                    limit_level=None
-                )
-                
-                if success:
-                    self.log_func(f"✅ {instrument_name}: Stop updated to {new_stop:.2f}")
-                    updated += 1
-                else:
-                    self.log_func(f"❌ {instrument_name}: Failed - {message}")
-                    failed += 1
-                
-                time.sleep(0.5)  # Rate limiting
+            if level is None:
+                self.log_func(f"⚠️ Skipping {instrument_name} - no level")
+                failed += 1
+                continue
             
-            self.log_func(f"📊 Bulk update complete: {updated} updated, {failed} failed")
-            return updated > 0
+            # Calculate new stop level
+            if direction == "BUY":
+                new_stop = level - stop_distance
+            else:  # SELL
+                new_stop = level + stop_distance
             
-        except Exception as e:
-            self.log_func(f"Error in bulk update: {e}")
-            return False
\ No newline at end of file
+            jobs.append((deal_id, new_stop, instrument_name))
+        
+        results = self.ig_client.update_positions_batch(
+            [{"deal_id": deal_id, "stop_level": new_stop} for deal_id, new_stop, _ in jobs],
+            rate_limiter=self._rate_limiter
+        )
+        
+        for (deal_id, new_stop, instrument_name), (success, message) in zip(jobs, results):
+            if success:
+                self.log_func(f"✅ {instrument_name}: Stop updated to {new_stop:.2f}")
+                updated += 1
+            else:
+                self.log_func(f"❌ {instrument_name}: Failed - {message}")
+                failed += 1
+        
+        self.log_func(f"📊 Bulk update complete: {updated} updated, {failed} failed")
+        return updated > 0
@@ -0,0 +1,52 @@
+"""
+Adaptive Interval
+Polling interval that follows how much the price has been moving
+"""
+from collections import deque
+
+
+class AdaptiveInterval:
+    """Shortens the poll interval while price moves and stretches it on quiet markets"""
+
+    def __init__(self, min_interval, max_interval, quiet_move, busy_move, window=5):
+        """
+        Args:
+            min_interval: Seconds to wait when the market is busy
+            max_interval: Seconds to wait when the market is quiet
+            quiet_move: Price range (over the window) at or below which the market counts as quiet
+            busy_move: Price range at or above which the market counts as busy
+            window: Number of recent prices to look at
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.quiet_move = quiet_move
+        self.busy_move = busy_move
+        self._recent_prices = deque(maxlen=window)
+
+    def add_price(self, price):
+        """Record the latest price"""
+        self._recent_prices.append(price)
+
+    def volatility(self):
+        """High-low range of the recent prices (None until two have been seen)"""
+        if len(self._recent_prices) < 2:
+            return None
+        return max(self._recent_prices) - min(self._recent_prices)
+
+    def next_interval(self, default):
+        """Seconds to wait before the next check - default until there is enough history
+        
+        A jump of more than quiet_move since the last price drops straight back to min_interval,
+        however quiet the rest of the window was.
+        """
+        volatility = self.volatility()
+        if volatility is None:
+            return default
+        if volatility >= self.busy_move or abs(self._recent_prices[-1] - self._recent_prices[-2]) > self.quiet_move:
+            return self.min_interval
+        if volatility <= self.quiet_move:
+            return self.max_interval
+
+        # In between - slide linearly from max_interval down to min_interval
+        fraction = (volatility - self.quiet_move) / (self.busy_move - self.quiet_move)
+        return self.max_interval - fraction * (self.max_interval - self.min_interval)
@@ -2,20 +2,31 @@
 Auto Trading Strategy
 Manages automatic ladder adjustment and trailing stop management
 """
-import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from trading.adaptive_interval import AdaptiveInterval
+from trading.working_order import parse_working_order
 
 class AutoStrategy:
     """Automated ladder management with trailing stops"""
     
-    def __init__(self, ig_client, ladder_strategy):
+    def __init__(self, ig_client, ladder_strategy, price_cache=None):
         self.ig_client = ig_client
         self.ladder_strategy = ladder_strategy
+        self.price_cache = price_cache or ladder_strategy.price_cache  # Share the ladder's price cache
+        self.rate_limiter = ladder_strategy.rate_limiter  # One request budget for both strategies
+        self.log_queue = ladder_strategy.log_queue  # Same log thread, so messages stay in order
         self.running = False
+        self._stop_event = threading.Event()  # Set by stop() to wake the monitor loop out of its wait
         self.monitor_thread = None
+        self._io_pool = ThreadPoolExecutor(max_workers=1)  # Fetches working orders while the price request is in flight
         
         # Configuration
-        self.check_interval = 30
+        self.check_interval = 30  # Used until there is enough price history to adapt
+        self.min_interval = 5  # Fastest check while price is moving
+        self.max_backoff = 2  # Slowest check on a quiet market, in check intervals
+        self.min_move = 0.5  # Price range (last 5 checks) below which the market counts as quiet
         self.adjustment_threshold = 10
         self.trailing_stop_distance = 20
         self.max_spread = 5
@@ -33,6 +44,7 @@ class AutoStrategy:
             return
         
         self.running = True
+        self._stop_event.clear()
         self.epic = epic
         self.direction = direction
         self.start_offset = start_offset
@@ -41,7 +53,11 @@ class AutoStrategy:
         self.order_size = order_size
         self.retry_jump = retry_jump
         self.max_retries = max_retries
-        self.log_callback = log_callback
+        self.log_callback = self.log_queue.wrap(log_callback)
+        
+        # Busy once the recent range reaches half the adjustment threshold
+        self._interval = AdaptiveInterval(self.min_interval, self.check_interval * self.max_backoff,
+                                          self.min_move, self.adjustment_threshold * 0.5)
         
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
@@ -51,6 +67,7 @@ class AutoStrategy:
     def stop(self):
         """Stop the auto strategy"""
         self.running = False
+        self._stop_event.set()
         if self.log_callback:
             self.log_callback("Auto strategy stopped")
     
@@ -58,27 +75,31 @@ class AutoStrategy:
         """Main monitoring loop - checks orders and adjusts as needed"""
         while self.running:
             try:
-                # Get current price
-                price_data = self.ig_client.get_market_price(self.epic)
-                if not price_data or not price_data.get('mid'):
-                    time.sleep(self.check_interval)
+                # Get working orders and current price at the same time
+                orders_future = self._io_pool.submit(self.ig_client.get_working_orders_cached)
+                current_price = self.price_cache.get_mid(self.epic)
+                if not current_price:
+                    if self._stop_event.wait(self.check_interval):
+                        break
                     continue
                 
-                current_price = price_data['mid']
+                self._interval.add_price(current_price)
+                delay = self._interval.next_interval(self.check_interval)
                 
-                # Get working orders
-                orders = self.ig_client.get_working_orders()
+                orders = orders_future.result()
                 
-                # Filter orders for this epic
-                our_orders = [
-                    o for o in orders 
-                    if o.get('marketData', {}).get('epic') == self.epic
-                ]
+                # Parse and group by epic in one pass, then take this strategy's epic
+                by_epic = {}
+                for raw_order in orders:
+                    order = parse_working_order(raw_order)
+                    by_epic.setdefault(order.epic, []).append(order)
+                our_orders = by_epic.get(self.epic, [])
                 
                 if not our_orders:
                     if self.log_callback:
                         self.log_callback("Auto-strategy: No orders found")
-                    time.sleep(self.check_interval)
+                    if self._stop_event.wait(delay):
+                        break
                     continue
                 
                 # Check if adjustment needed
@@ -89,54 +110,64 @@ class AutoStrategy:
                         self.log_callback("Auto-strategy: Adjusting ladder...")
                     self._adjust_ladder(our_orders, current_price)
                 
-                time.sleep(self.check_interval)
+                if self._stop_event.wait(delay):
+                    break
                 
             except Exception as e:
                 if self.log_callback:
                     self.log_callback(f"Auto-strategy error: {e}")
-                time.sleep(self.check_interval)
+                if self._stop_event.wait(self.check_interval):
+                    break
     
     def _check_if_adjustment_needed(self, orders, current_price):
         """Check if ladder needs adjustment"""
         if not orders:
             return False
         
-        # Find closest order to current price
-        closest_distance = float('inf')
-        
-        for order in orders:
-            order_data = order.get('workingOrderData', {})
-            order_level = order_data.get('orderLevel')
-            
-            if order_level:
-                distance = abs(current_price - order_level)
-                closest_distance = min(closest_distance, distance)
+        # Find closest order to current price in one pass
+        closest_distance = min(
+            (abs(current_price - order.level) for order in orders if order.level),
+            default=float('inf')
+        )
         
         # If closest order is beyond threshold, need adjustment
         return closest_distance > self.adjustment_threshold
     
     def _adjust_ladder(self, orders, current_price):
-        """Adjust ladder positions"""
+        """Adjust ladder positions (WorkingOrders) - re-centre every rung on the current price"""
+        # +1 for BUY (rungs above price), -1 for SELL (rungs below)
+        signs = {"BUY": 1, "SELL": -1}
+        
+        def distance_from_price(order):
+            # Signed level - the nearest rung sorts first for either direction
+            return signs.get(order.direction, 1) * (order.level or 0)
+        
         try:
-            # For each order, calculate new level
-            for order in orders:
-                order_data = order.get('workingOrderData', {})
-                deal_id = order_data.get('dealId')
-                direction = order_data.get('direction')
-                old_level = order_data.get('orderLevel')
-                stop_level = order_data.get('stopLevel')
-                guaranteed_stop = order_data.get('guaranteedStop', False)
+            # Rungs keep their order - the nearest becomes rung 0 at start_offset,
+            # the next start_offset + step_size, and so on
+            rung = {"BUY": 0, "SELL": 0}
+            
+            # Work out every new level first, then send the updates as one batch
+            jobs = []  # (deal_id, old_level, new_level)
+            updates = []
+            for order in sorted(orders, key=distance_from_price):
+                deal_id = order.deal_id
+                direction = order.direction
+                old_level = order.level
+                stop_level = order.stop_level
+                guaranteed_stop = order.guaranteed_stop
                 
-                if not deal_id or not old_level:
+                if not deal_id or not old_level or direction not in signs:
                     continue
                 
-                # Calculate offset from current price
-                if direction == "BUY":
-                    offset = old_level - current_price
-                    new_level = current_price + offset
-                else:  # SELL
-                    offset = current_price - old_level
-                    new_level = current_price - offset
+                # Offset from current price for this rung
+                offset = self.start_offset + rung[direction] * self.step_size
+                rung[direction] += 1
+                new_level = current_price + signs[direction] * offset
+                
+                # Already where it should be - nothing to send
+                if abs(new_level - old_level) < 1e-6:
+                    continue
                 
                 # Calculate new stop level if stop exists
                 new_stop_distance = None
@@ -145,32 +176,37 @@ class AutoStrategy:
                     # Preserve the same stop distance with the new level
                     new_stop_distance = stop_distance
                 
-                # Update the order - FIX: Use correct parameter names
-                success, message = self.ig_client.update_working_order(
-                    deal_id,  # positional arg
-                    new_level,  # positional arg - new order level
-                    stop_distance=new_stop_distance,  # preserve stop
-                    guaranteed_stop=guaranteed_stop
-                )
-                
+                jobs.append((deal_id, old_level, new_level))
+                updates.append({
+                    "deal_id": deal_id,
+                    "new_level": new_level,
+                    "stop_distance": new_stop_distance,  # preserve stop
+                    "guaranteed_stop": guaranteed_stop
+                })
+            
+            results = self.ig_client.update_working_orders_batch(updates, rate_limiter=self.rate_limiter)
+            
+            for (deal_id, old_level, new_level), (success, message) in zip(jobs, results):
                 if success:
                     if self.log_callback:
                         self.log_callback(f"Adjusted order {deal_id}: {old_level:.2f} → {new_level:.2f}")
                 else:
                     if self.log_callback:
                         self.log_callback(f"Failed to adjust order {deal_id}: {message}")
-                
-                time.sleep(0.5)  # Rate limiting
-                
+            
+            self.current_ladder_base = current_price
+            
         except Exception as e:
             if self.log_callback:
                 self.log_callback(f"Error adjusting ladder: {e}")
     
     def configure(self, check_interval=None, adjustment_threshold=None, 
-                 trailing_stop_distance=None, max_spread=None):
+                 trailing_stop_distance=None, max_spread=None, max_backoff=None):
         """Update configuration parameters"""
         if check_interval is not None:
             self.check_interval = check_interval
+        if max_backoff is not None:
+            self.max_backoff = max_backoff
         if adjustment_threshold is not None:
             self.adjustment_threshold = adjustment_threshold
         if trailing_stop_distance is not None:
@@ -2,19 +2,147 @@
 Ladder Trading Strategy
 Implements ladder order placement with automatic retry on level errors
 """
+import json
+import logging
+import os
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api.ig_client import is_rate_limited, parse_json
+from api.rate_limiter import TokenBucket
+from trading.adaptive_interval import AdaptiveInterval
+from trading.log_queue import LogQueue
+from trading.price_cache import PriceCache
+from trading.working_order import parse_working_order
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_SENDS = 3  # Times a rung is sent at the same level while IG is throttling
+STATE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # Project root, whatever the working directory
 
 
 class LadderStrategy:
     """Ladder strategy for placing multiple stop orders"""
 
-    def __init__(self, ig_client):
+    def __init__(self, ig_client, price_cache=None):
         self.ig_client = ig_client
-        self.placed_orders = []  # Track placed orders
+        self.price_cache = price_cache or PriceCache(ig_client)  # Shared with AutoStrategy
+        self.rate_limiter = TokenBucket(rate=60 / 60, capacity=10)  # Order requests: 60/min, bursts of 10
+        self.log_queue = LogQueue()  # Trading loops log through this, not the GUI callback directly
+        self.placed_orders = {}  # {deal_id: order} for the last ladder placed
+        self._stop_by_epic_dir = {}  # {(epic, direction): stop info} of the last ladder placed there - read by trailing
         self.trailing_active = False
-        self.cancel_requested = False
+        self._trail_session = 0  # Bumped on every start, so a loop from an earlier session exits
+        self._trail_wake = threading.Event()  # Wakes the trail loop out of its wait - on stop, price moves and new orders
+        self._cancel_evt = threading.Event()  # Set by a user cancel - ladder waits return as soon as it is
+        self._confirms_streaming = False  # Deal confirmations subscribed on the trade stream
         self.position_monitoring_active = False  # NEW
         self.monitored_positions = set()  # NEW
+        self.keepalive_interval = 30  # Seconds between pings while orders are live
+        self.trail_backoff = 2  # Longest trailing wait on a quiet market, in check intervals, when polling prices
+        self.trail_stream_backoff = 4  # Same while the price stream is up - ticks wake the loop, polling is a safety net
+        self._keepalive_stop = threading.Event()  # Ends the keep-alive thread - set on stop/cancel/clear
+        self._keepalive_thread = None
+
+        # Placed orders survive a restart - entries older than state_max_age are dropped on load
+        self.state_file = os.path.join(STATE_DIR, "ladder_orders.json")
+        self.state_max_age = 24 * 60 * 60
+        self._unreconciled = set()  # Restored deal IDs not yet checked against IG's working orders
+        self._load_orders()
+
+    def _start_keepalive(self):
+        """Keep the IG connection warm while orders are out, so amends and cancels skip the TLS handshake"""
+        if self._keepalive_thread is not None and self._keepalive_thread.is_alive():
+            return
+        self._keepalive_stop.clear()
+        self._keepalive_thread = threading.Thread(target=self._keepalive, daemon=True)
+        self._keepalive_thread.start()
+
+    def _stop_keepalive(self):
+        self._keepalive_stop.set()
+
+    def _keepalive(self):
+        """Ping IG every keepalive_interval seconds until stopped, or until no orders or trailing are live"""
+        while not self._keepalive_stop.wait(self.keepalive_interval):
+            if not (self.placed_orders or self.trailing_active) or not self.ig_client.logged_in:
+                break
+            self.ig_client.ping()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_evt.is_set()
+
+    @cancel_requested.setter
+    def cancel_requested(self, value):
+        if value:
+            self._cancel_evt.set()
+        else:
+            self._cancel_evt.clear()
+
+    def _load_orders(self):
+        """Restore placed orders saved by a previous run, skipping stale ones"""
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                orders = json.load(f)
+            cutoff = time.time() - self.state_max_age
+            self.placed_orders = {deal_id: order for deal_id, order in orders.items()
+                                  if order.get('placed_at', 0) >= cutoff}
+            self._unreconciled = set(self.placed_orders)
+        except Exception as e:
+            print(f"Warning: Could not load ladder orders: {e}")
+
+    def _reconcile_orders(self, log):
+        """Drop restored orders that are no longer working at IG - needs a logged-in client
+        
+        If the check fails the orders stay unreconciled and the next call tries again.
+        """
+        if not self._unreconciled:
+            return
+        try:
+            working_orders = self.ig_client.get_working_orders(raise_on_error=True)
+        except Exception as e:
+            log(f"Could not check restored orders against IG: {e}")
+            return
+
+        live = {parse_working_order(raw).deal_id for raw in working_orders}
+        stale = self._unreconciled - live
+        for deal_id in stale:
+            self.placed_orders.pop(deal_id, None)
+        for deal_id in self._unreconciled & live:
+            order = self.placed_orders.get(deal_id)
+            if order:
+                # Newer ladders placed since the restart keep their own stop info
+                self._stop_by_epic_dir.setdefault((order['epic'], order['direction']), {
+                    'stop_distance': order.get('stop_distance'),
+                    'guaranteed': order.get('guaranteed_stop', False)
+                })
+        self._unreconciled = set()
+
+        if stale:
+            log(f"Dropped {len(stale)} restored order(s) no longer working at IG")
+            self._save_orders()
+
+    def _save_orders(self):
+        """Write placed orders to disk (temp file + rename so it is never half-written)"""
+        try:
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(self.placed_orders, f, indent=2)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            print(f"Warning: Could not save ladder orders: {e}")
+
+    def clear_orders(self):
+        """Forget the placed orders, on disk too"""
+        self.placed_orders = {}
+        self._unreconciled = set()
+        self._save_orders()
+        if not self.trailing_active:
+            self._stop_keepalive()
 
     def place_ladder(self, epic, direction, start_offset, step_size, num_orders,
                         order_size, retry_jump=10, max_retries=3, log_callback=None,
@@ -29,15 +157,20 @@ class LadderStrategy:
                     print(message)
 
             # Clear previous orders tracking
-            self.placed_orders = []
+            self.placed_orders = {}
+            self._unreconciled = set()
+
+            # Confirmations arrive on the trade stream when it is available - saves a GET per order.
+            # Subscribed once, and again only after the stream has dropped
+            if not self._confirms_streaming or not self.ig_client.is_stream_connected():
+                self._confirms_streaming = self.ig_client.stream_confirms()
 
             # Get current price
-            price_data = self.ig_client.get_market_price(epic)
-            if not price_data or not price_data['mid']:
+            current_price = self.price_cache.get_mid(epic)
+            if not current_price:
                 log("Could not get market price")
                 return 0, num_orders
 
-            current_price = price_data['mid']
             log(f"Current {epic} price: {current_price}")
 
             # Log stop loss configuration
@@ -45,37 +178,43 @@ class LadderStrategy:
                 stop_type = "Guaranteed" if guaranteed_stop else "Regular"
                 log(f"Using {stop_type} stops at {stop_distance} points distance")
 
-            successful_orders = 0
-
-            for i in range(num_orders):
-                # Check for cancellation
-                if self.cancel_requested:
-                    log("Ladder placement cancelled by user")
-                    self.cancel_requested = False
-                    return successful_orders, num_orders
-
-                placed = False
+            # Work out every rung and retry offset once - BUY ladders step up from price, SELL ladders down
+            sign = 1 if direction == "BUY" else -1
+            base_levels = [current_price + sign * (start_offset + i * step_size) for i in range(num_orders)]
+            retry_offsets = [retry_attempt * retry_jump for retry_attempt in range(max_retries)]
+            levels = [[base + sign * offset for offset in retry_offsets] for base in base_levels]  # levels[rung][retry]
 
+            def send_rung(i, log):
+                """Place rung i, retrying further out on level errors - returns the placed order or None"""
                 for retry_attempt in range(max_retries):
-                    # Calculate offset
-                    current_offset = start_offset + (retry_attempt * retry_jump)
+                    # Each retry pushes the order further from price
+                    current_offset = start_offset + retry_offsets[retry_attempt]
+                    order_level = levels[i][retry_attempt]
 
-                    # Calculate order level - MUST BE INSIDE RETRY LOOP
-                    if direction == "BUY":
-                        order_level = current_price + current_offset + (i * step_size)
-                    else:
-                        order_level = current_price - current_offset - (i * step_size)
-
-                    # Try to place the order
-                    response = self.ig_client.place_order(
-                        epic, direction, order_size, order_level,
-                        stop_distance=stop_distance,
-                        guaranteed_stop=guaranteed_stop,
-                        limit_distance=limit_distance
-                    )
+                    # Try to place the order - waits only if the request budget is used up
+                    for send_attempt in range(RATE_LIMIT_SENDS):
+                        if self._cancel_evt.is_set():
+                            return None  # Cancelled - nothing more is sent, even for rungs already running
+                        if not self.rate_limiter.acquire(cancel=self._cancel_evt):
+                            return None  # Cancelled while waiting for the request budget
+                        response = self.ig_client.place_order(
+                            epic, direction, order_size, order_level,
+                            stop_distance=stop_distance,
+                            guaranteed_stop=guaranteed_stop,
+                            limit_distance=limit_distance
+                        )
+                        if not is_rate_limited(response) or send_attempt == RATE_LIMIT_SENDS - 1:
+                            break
+                        # IG is throttling - slow every rung down (0.5s, 1s, ... capped at 4s) and resend this level
+                        backoff = min(0.5 * 2 ** send_attempt, 4.0)
+                        log(f"Order {i+1} rate limited - backing off {backoff:.1f}s")
+                        self.rate_limiter.penalize(backoff)
+                        # Jitter so rungs don't resend in lockstep
+                        if self._cancel_evt.wait(random.uniform(0, 0.1 * 2 ** send_attempt)):
+                            return None
 
                     if response.status_code == 200:
-                        deal_ref = response.json().get('dealReference')
+                        deal_ref = parse_json(response).get('dealReference')
                         if deal_ref:
                             deal_status = self.ig_client.check_deal_status(deal_ref)
 
@@ -88,18 +227,16 @@ class LadderStrategy:
                                 if limit_distance > 0:
                                     log(f"  with limit at {limit_distance} points")
 
-                                successful_orders += 1
-                                placed = True
-
-                                self.placed_orders.append({
-                                'level': order_level,
-                                'direction': direction,
-                                'epic': epic,
-                                'size': order_size,
-                                'stop_distance': stop_distance,  # ADD THIS
-                                'guaranteed_stop': guaranteed_stop  # ADD THIS
-                            })
-                                break
+                                return {
+                                    'deal_id': deal_status.get('dealId') or deal_ref,
+                                    'level': order_level,
+                                    'direction': direction,
+                                    'epic': epic,
+                                    'size': order_size,
+                                    'stop_distance': stop_distance,
+                                    'guaranteed_stop': guaranteed_stop,
+                                    'placed_at': time.time()
+                                }
 
                             elif deal_status.get('reason') == 'ATTACHED_ORDER_LEVEL_ERROR':
                                 log(f"Order {i+1} stop level error - stop distance: {stop_distance}, entry: {order_level}")
@@ -111,16 +248,48 @@ class LadderStrategy:
                             else:
                                 log(f"Order {i+1} rejected: {deal_status.get('reason')}")
                                 break
+                        else:
+                            # Nothing to confirm - a wider offset won't help
+                            log(f"Order {i+1} failed: no deal reference returned")
+                            break
                     else:
                         log(f"Order {i+1} failed: {response.text}")
                         break
 
-                    time.sleep(0.3)
+                log(f"Order {i+1} could not be placed")
+                return None
+
+            def place_rung(i):
+                """Place rung i - returns (order or None, its log lines) so the lines can be logged in rung order"""
+                messages = []
+                return send_rung(i, messages.append), messages
 
-                if not placed:
-                    log(f"Order {i+1} could not be placed")
+            # Rungs don't depend on each other, so they go out together - the rate limiter still caps the pace.
+            # map() hands results back in rung order, so the log reads as if they were placed one by one
+            placed = []
+            with ThreadPoolExecutor(max_workers=max(1, min(8, num_orders))) as executor:
+                for order, messages in executor.map(place_rung, range(num_orders)):
+                    for message in messages:
+                        log(message)
+                    placed.append(order)
 
-                time.sleep(0.5)
+            self.placed_orders = {order['deal_id']: order for order in placed if order}
+            self._save_orders()
+            successful_orders = len(self.placed_orders)
+
+            if successful_orders:
+                self._stop_by_epic_dir[(epic, direction)] = {
+                    'stop_distance': stop_distance,
+                    'guaranteed': guaranteed_stop
+                }
+                self._start_keepalive()
+
+            if self.cancel_requested:
+                log("Ladder placement cancelled by user")
+                if not self.trailing_active:
+                    self._stop_keepalive()
+                self.cancel_requested = False
+                return successful_orders, num_orders
 
             log(f"Ladder complete: {successful_orders}/{num_orders} orders placed successfully")
             return successful_orders, num_orders
@@ -131,7 +300,7 @@ class LadderStrategy:
             log("No orders to modify")
             return
 
-        for order in self.placed_orders:
+        for order in self.placed_orders.values():
             # Basic implementation - just logs for now
             action = "Adding" if enable else "Removing"
             log(f"{action} limit on order at {order['level']:.2f}")
@@ -148,7 +317,6 @@ class LadderStrategy:
             log: Logging callback
             stop_distance: Stop distance in points to apply
         """
-        import threading
         import time
         
         self.position_monitoring_active = True
@@ -188,6 +356,7 @@ class LadderStrategy:
                                 stop_level = open_level + stop_distance
                             
                             # Apply stop
+                            self.rate_limiter.acquire()
                             success, message = self.ig_client.update_position_stop(deal_id, stop_level)
                             
                             if success:
@@ -196,8 +365,6 @@ class LadderStrategy:
                             else:
                                 log(f"{epic}: Failed to apply stop - {message}")
                             
-                            time.sleep(0.3)  # Rate limiting
-                            
                         except Exception as e:
                             log(f"Error processing position: {str(e)}")
                             continue
@@ -227,143 +394,199 @@ class LadderStrategy:
                 min_move: Minimum price movement in points to trigger adjustment (default: 0.5)
                 check_interval: Seconds between checks (default: 30)
             """
-            import threading
             import time
             
+            if self.trailing_active:
+                log("Trailing already running")
+                return
+            
             self.trailing_active = True
+            self._trail_session += 1
+            session = self._trail_session
+            self._trail_wake.clear()
+            self._start_keepalive()
+            log = self.log_queue.wrap(log)
             
             def trail_orders():
                 """Background thread to monitor and adjust ALL orders while preserving stops"""
                 
                 log(f"Trailing started - checking every {check_interval}s, min move: {min_move} pts")
                 
-                # Track original offset and stop info for each order (key = deal_id)
-                order_offsets = {}
-                order_stops = {}
+                # Per order (key = deal_id): (sign, original offset, stop info) - one lookup per check
+                # sign is +1 for BUY (trails DOWN as price falls) and -1 for SELL (trails UP as price rises)
+                order_state = {}
+                
+                # Orders restored from a previous run may have filled or been cancelled since
+                self._reconcile_orders(log)
+                
+                # Orders from the last ladder are looked up by deal_id, older ladders' by (epic, direction)
+                # Orders from anywhere else fall back to the last ladder's stop
+                if self.placed_orders:
+                    first_order = next(iter(self.placed_orders.values()))
+                    default_stop_info = {
+                        'stop_distance': first_order.get('stop_distance'),
+                        'guaranteed': first_order.get('guaranteed_stop', False)
+                    }
+                else:
+                    default_stop_info = {
+                        'stop_distance': None,
+                        'guaranteed': False
+                    }
+                logger.debug("Stops known for %d ladder(s), default stop %s",
+                             len(self._stop_by_epic_dir), default_stop_info['stop_distance'])
+                
+                # Price each epic was last evaluated at - known orders are skipped until it moves min_move from here
+                last_prices = {}
+                
+                # Per-epic poll pacing - check faster while any epic is moving, back off when all are quiet
+                intervals = {}
+                
+                # With the Lightstreamer feed up, price ticks and new orders wake the loop and polling only backs it up
+                def on_tick(epic, mid):
+                    last = last_prices.get(epic)
+                    if last is not None and abs(mid - last) >= min_move:
+                        self._trail_wake.set()
+                
+                def on_wou(update):
+                    if update.get("status") == "OPEN":
+                        self._trail_wake.set()
+                
+                self.price_cache.add_tick_listener(on_tick)
+                trade_subscription = self.ig_client.subscribe_trade_stream(on_wou=on_wou)
                 
                 check_count = 0
-                while self.trailing_active:
+                while self.trailing_active and self._trail_session == session:
+                    delay = check_interval
                     try:
                         check_count += 1
                         
                         if check_count % 5 == 1:
                             log(f"Trailing check #{check_count} (next in {check_interval}s)...")
                         
-                        working_orders = self.ig_client.get_working_orders()
+                        self._reconcile_orders(log)  # No-op once restored orders have been checked
                         
-                        if not working_orders:
+                        # Order updates invalidate the snapshot while the trade stream is up, so it can be kept longer
+                        streaming = trade_subscription is not None and self.ig_client.is_stream_connected()
+                        orders_ttl = check_interval * self.trail_stream_backoff if streaming else 5
+                        
+                        # Parse, validate and group by epic in one pass - incomplete orders can't be trailed
+                        by_epic = {}
+                        for raw_order in self.ig_client.get_working_orders_cached(ttl=orders_ttl):
+                            order = parse_working_order(raw_order)
+                            if order.epic and order.level and order.direction and order.deal_id:
+                                by_epic.setdefault(order.epic, []).append(order)
+                        
+                        if not by_epic:
                             if check_count % 5 == 1:
                                 log("No working orders found")
-                            time.sleep(check_interval)
+                            self._trail_wake.wait(check_interval)
+                            self._trail_wake.clear()
                             continue
                         
+                        # Streamed epics stay fresh in the price cache, so get_mids below costs no request
+                        if streaming:
+                            streaming = self.price_cache.stream(by_epic.keys())
+                        
                         orders_checked = 0
                         orders_trailed = 0
                         
-                        # Cache prices per epic
-                        price_cache = {}
+                        # One price snapshot for every epic with a working order
+                        price_cache = self.price_cache.get_mids(by_epic.keys())
+                        for epic, mid in price_cache.items():
+                            if epic not in intervals:
+                                intervals[epic] = AdaptiveInterval(min(5, check_interval), check_interval * self.trail_backoff,
+                                                                   min_move, min_move * 10)
+                            intervals[epic].add_price(mid)
+                        if streaming:
+                            delay = check_interval * self.trail_stream_backoff  # Ticks wake the loop - this is only a safety net
+                        elif price_cache:
+                            delay = min(intervals[epic].next_interval(check_interval) for epic in price_cache)
                         
-                        for order in working_orders:
-                            try:
-                                order_data = order.get('workingOrderData', {})
-                                market_data = order.get('marketData', {})
-                                
-                                epic = market_data.get('epic')
-                                current_level = order_data.get('level')
-                                direction = order_data.get('direction')
-                                deal_id = order_data.get('dealId')
-                                
-                                if not all([epic, current_level, direction, deal_id]):
-                                    continue
-                                
-                                orders_checked += 1
-                                
-                                # Get price (cached)
-                                if epic not in price_cache:
-                                    price_data = self.ig_client.get_market_price(epic)
-                                    if not price_data or not price_data['mid']:
+                        quiet_epics = {
+                            epic for epic, mid in price_cache.items()
+                            if epic in last_prices and abs(mid - last_prices[epic]) < min_move
+                        }
+                        for epic, mid in price_cache.items():
+                            if epic not in quiet_epics:
+                                last_prices[epic] = mid
+                        
+                        # Forget filled/cancelled orders so order_state only holds live ones
+                        live_deal_ids = {order.deal_id for epic_orders in by_epic.values() for order in epic_orders}
+                        for deal_id in order_state.keys() - live_deal_ids:
+                            del order_state[deal_id]
+                        
+                        pending_updates = []  # (deal_id, epic, direction, current_level, new_level, stop_info) sent as one batch
+                        
+                        for epic, epic_orders in by_epic.items():
+                            current_price = price_cache.get(epic)
+                            quiet = epic in quiet_epics
+                            
+                            for order in epic_orders:
+                                try:
+                                    current_level = order.level
+                                    direction = order.direction
+                                    deal_id = order.deal_id
+                                    orders_checked += 1
+                                    
+                                    if not current_price:
                                         continue
-                                    price_cache[epic] = price_data['mid']
-                                
-                                current_price = price_cache[epic]
-                                
-                                # First time seeing this order - record its offset and look up stop info
-                                if deal_id not in order_offsets:
-                                    if direction == "BUY":
-                                        order_offsets[deal_id] = current_level - current_price
-                                    else:  # SELL
-                                        order_offsets[deal_id] = current_price - current_level
-                                
-                                # Look up stop info ONCE and store it permanently
-                                if deal_id not in order_stops:
-                                    # All orders from the same ladder have the same stop_distance
-                                    # Just use the first order's stop info for this epic/direction
-                                    tracked_order = next((o for o in self.placed_orders 
-                                                        if o.get('stop_distance') is not None), None)
-                                    if tracked_order:
-                                        order_stops[deal_id] = {
-                                            'stop_distance': tracked_order.get('stop_distance'),
-                                            'guaranteed': tracked_order.get('guaranteed_stop', False)
-                                        }
-                                        log(f"DEBUG: Using stop {tracked_order.get('stop_distance')} for {deal_id}")
-                                    else:
-                                        # No orders with stops
-                                        order_stops[deal_id] = {
-                                            'stop_distance': None,
-                                            'guaranteed': False
-                                        }
-                                        log(f"DEBUG: No stop distance found in placed_orders")
-                                
-                                # Use the ORIGINAL offset
-                                original_offset = order_offsets[deal_id]
-                                stop_info = order_stops.get(deal_id, {'stop_distance': None, 'guaranteed': False})
-                                
-                                if direction == "BUY":
-                                    # BUY orders trail DOWN as price falls
-                                    ideal_level = current_price + original_offset
                                     
-                                    # Only move DOWN
-                                    if ideal_level < current_level - min_move:
-                                        new_level = ideal_level
-                                        
-                                        success, message = self.ig_client.update_working_order(
-                                        deal_id,
-                                        new_level,  # ✅ Second positional argument (the new order price)
-                                        stop_distance=stop_info['stop_distance'],  # ✅ Preserve the stop distance
-                                        guaranteed_stop=stop_info['guaranteed']
-                                    )
+                                    state = order_state.get(deal_id)
+                                    if state is not None and quiet:
+                                        continue  # Price hasn't moved enough to trail this order
+                                    if state is None:
+                                        if direction not in ("BUY", "SELL"):
+                                            continue
+                                        sign = 1 if direction == "BUY" else -1
                                         
-                                        if success:
-                                            stop_msg = f" (stop: {stop_info['stop_distance']})" if stop_info['stop_distance'] else ""
-                                            log(f"{epic} BUY: Trailed DOWN {current_level:.2f} → {new_level:.2f}{stop_msg}")
-                                            orders_trailed += 1
+                                        # First time seeing this order - record its offset and stop info permanently
+                                        placed = self.placed_orders.get(deal_id)
+                                        if placed:
+                                            stop_info = {
+                                                'stop_distance': placed.get('stop_distance'),
+                                                'guaranteed': placed.get('guaranteed_stop', False)
+                                            }
                                         else:
-                                            log(f"{epic}: Trail failed - {message}")
-                                
-                                elif direction == "SELL":
-                                    # SELL orders trail UP as price rises
-                                    ideal_level = current_price - original_offset
+                                            stop_info = self._stop_by_epic_dir.get((epic, direction), default_stop_info)
+                                        state = order_state[deal_id] = (sign, sign * (current_level - current_price), stop_info)
                                     
-                                    # Only move UP
-                                    if ideal_level > current_level + min_move:
-                                        new_level = ideal_level
-                                        
-                                        success, message = self.ig_client.update_working_order(
-                                        deal_id,
-                                        new_level,  # ✅ This is the order price
-                                        stop_distance=stop_info['stop_distance'],  # ✅ This preserves the stop
-                                        guaranteed_stop=stop_info['guaranteed']
-                                    )
-                                        if success:
-                                            stop_msg = f" (stop: {stop_info['stop_distance']})" if stop_info['stop_distance'] else ""
-                                            log(f"{epic} SELL: Trailed UP {current_level:.2f} → {new_level:.2f}{stop_msg}")
-                                            orders_trailed += 1
-                                        else:
-                                            log(f"{epic}: Trail failed - {message}")
-                            
-                            except Exception as e:
-                                log(f"Error processing order: {str(e)}")
-                                continue
+                                    sign, original_offset, stop_info = state
+                                    
+                                    # Use the ORIGINAL offset - orders only ever move towards price
+                                    ideal_level = current_price + sign * original_offset
+                                    if sign * (current_level - ideal_level) > min_move:
+                                        pending_updates.append((deal_id, epic, direction, current_level, ideal_level, stop_info))
+                                    
+                                except Exception as e:
+                                    log(f"Error processing order: {str(e)}")
+                                    continue
+                        
+                        # Send this check's moves together - new_level is the order price, stop_distance preserves the stop
+                        results = self.ig_client.update_working_orders_batch([
+                            {
+                                'deal_id': deal_id,
+                                'new_level': new_level,
+                                'stop_distance': stop_info['stop_distance'],
+                                'guaranteed_stop': stop_info['guaranteed']
+                            }
+                            for deal_id, _, _, _, new_level, stop_info in pending_updates
+                        ], rate_limiter=self.rate_limiter)
+                        
+                        placed_moved = False  # Save the new levels once per check, not per order
+                        for (deal_id, epic, direction, current_level, new_level, stop_info), (success, message) in zip(pending_updates, results):
+                            if success:
+                                stop_msg = f" (stop: {stop_info['stop_distance']})" if stop_info['stop_distance'] else ""
+                                arrow = "DOWN" if direction == "BUY" else "UP"
+                                log(f"{epic} {direction}: Trailed {arrow} {current_level:.2f} → {new_level:.2f}{stop_msg}")
+                                orders_trailed += 1
+                                if deal_id in self.placed_orders:
+                                    self.placed_orders[deal_id]['level'] = new_level
+                                    placed_moved = True
+                            else:
+                                log(f"{epic}: Trail failed - {message}")
+                        
+                        if placed_moved:
+                            self._save_orders()
                         
                         # Summary every 5 checks
                         if check_count % 5 == 0 and orders_checked > 0:
@@ -372,14 +595,19 @@ class LadderStrategy:
                     except Exception as e:
                         log(f"Trailing error: {str(e)}")
                     
-                    time.sleep(check_interval)
+                    self._trail_wake.wait(delay)
+                    self._trail_wake.clear()
                 
+                self.price_cache.remove_tick_listener(on_tick)
+                self.ig_client.unsubscribe_stream(trade_subscription)
                 log("Trailing stopped")
             
-            # Start the trailing thread
-            trail_thread = threading.Thread(target=trail_orders, daemon=True)
+            # Start the trailing thread - daemon so an open trail never holds up app exit
+            trail_thread = threading.Thread(target=trail_orders, daemon=True, name=f"ladder-trail-{session}")
             trail_thread.start()
             
     def stop_trailing(self):
         """Stop trailing stops"""
-        self.trailing_active = False
\ No newline at end of file
+        self.trailing_active = False
+        self._trail_wake.set()
+        self._stop_keepalive()
\ No newline at end of file
@@ -0,0 +1,40 @@
+"""
+Log Queue
+Hands log messages to a background thread so the trading loops never wait on logging
+"""
+import queue
+import threading
+
+
+class LogQueue:
+    """Bounded queue of (callback, message) drained by one daemon thread - messages are dropped when full"""
+
+    def __init__(self, maxsize=1000):
+        """
+        Args:
+            maxsize: Messages held before new ones are dropped
+        """
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while True:
+            callback, message = self._queue.get()
+            try:
+                callback(message)
+            except Exception as e:
+                print(f"Log callback error: {e}")
+
+    def wrap(self, callback):
+        """Return a log function that queues messages for callback instead of calling it inline"""
+        if callback is None:
+            return None
+
+        def log(message):
+            try:
+                self._queue.put_nowait((callback, message))
+            except queue.Full:
+                pass  # Dropping a log line beats stalling a trade
+
+        return log
@@ -0,0 +1,150 @@
+"""
+Price Cache
+Short-lived market price cache shared by the trading strategies
+"""
+import threading
+import time
+
+
+class PriceCache:
+    """Reuses a market price fetched within the last ttl seconds - callers asking together share one request"""
+
+    def __init__(self, ig_client, ttl=1.0, stream_max_age=30):
+        """
+        Args:
+            ig_client: IGClient used to fetch prices
+            ttl: Seconds a fetched price stays fresh
+            stream_max_age: A streamed price with no tick for this many ttls is fetched over REST again
+        """
+        self.ig_client = ig_client
+        self.ttl = ttl
+        self.stream_max_age = stream_max_age
+        self._prices = {}  # {epic: (fetched_at, price_data)}
+        self._epic_locks = {}  # {epic: Lock} so only one thread fetches a given epic at a time
+        self._lock = threading.RLock()  # Re-entrant - a stream client may confirm a subscription before subscribe returns
+        
+        # Epics kept fresh by the Lightstreamer price stream - their prices last longer while it is connected
+        self._streamed = set()  # Subscriptions the server has confirmed
+        self._requested = set()  # Subscriptions sent, confirmed or not - so an epic is only subscribed once
+        self._stream_client = None  # Stream connection the subscriptions belong to
+        self._tick_listeners = []
+    
+    def _is_fresh(self, epic, cached, now, ttl=None):
+        if not cached:
+            return False
+        ttl = self.ttl if ttl is None else ttl
+        age = now - cached[0]
+        if age < ttl:
+            return True
+        # A silent stream can't be told apart from a quiet market, so even streamed prices expire eventually
+        return (age < ttl * self.stream_max_age and epic in self._streamed
+                and self.ig_client.is_stream_connected())
+
+    def get(self, epic, ttl=None):
+        """Get price data (bid/offer/mid) for an epic, or None if it could not be fetched
+        
+        ttl overrides the cache's own freshness limit for this call - callers that can live
+        with an older price (risk checks) pass a longer one.
+        """
+        with self._lock:
+            epic_lock = self._epic_locks.setdefault(epic, threading.Lock())
+
+        with epic_lock:
+            cached = self._prices.get(epic)
+            if self._is_fresh(epic, cached, time.monotonic(), ttl):
+                return cached[1]
+
+            price_data = self.ig_client.get_market_price(epic)
+            if price_data and price_data.get('mid'):
+                self._prices[epic] = (time.monotonic(), price_data)
+            return price_data
+
+    def get_mid(self, epic, ttl=None):
+        """Get the mid price for an epic, or None"""
+        price_data = self.get(epic, ttl)
+        return price_data.get('mid') if price_data else None
+
+    def get_mids(self, epics):
+        """
+        Get mid prices for several epics - stale ones are refreshed with one bulk /markets request
+
+        Returns:
+            dict of {epic: mid} for the epics that have a price
+        """
+        now = time.monotonic()
+        mids = {}
+        missing = []
+        for epic in epics:
+            cached = self._prices.get(epic)
+            if self._is_fresh(epic, cached, now):
+                mids[epic] = cached[1]['mid']
+            else:
+                missing.append(epic)
+
+        if len(missing) > 1:
+            for epic, price_data in self.ig_client.get_markets_bulk(missing).items():
+                if price_data.get('mid'):
+                    self._prices[epic] = (now, price_data)
+                    mids[epic] = price_data['mid']
+            missing = [epic for epic in missing if epic not in mids]
+
+        # Anything the bulk call did not return is fetched on its own
+        for epic in missing:
+            mid = self.get_mid(epic)
+            if mid:
+                mids[epic] = mid
+        return mids
+    
+    def stream(self, epics):
+        """
+        Subscribe epics to the price stream (once each) so their prices stay fresh without polling
+        
+        Returns:
+            True if every epic's subscription is confirmed, False if any is still pending or streaming is unavailable
+        """
+        epics = list(epics)
+        with self._lock:
+            stream_client = self.ig_client.stream_client
+            if self._stream_client is not stream_client:
+                # Reconnected - the old subscriptions went with the old client
+                self._streamed.clear()
+                self._requested.clear()
+                self._stream_client = stream_client
+            
+            new_epics = [epic for epic in epics if epic not in self._requested]
+            if new_epics:
+                def on_status(status_epics, subscribed):
+                    self._on_subscription(stream_client, status_epics, subscribed)
+                
+                self._requested.update(new_epics)
+                if self.ig_client.subscribe_prices(new_epics, self._on_tick, on_status) is None:
+                    self._requested.difference_update(new_epics)
+                    return False
+            return all(epic in self._streamed for epic in epics)
+    
+    def _on_subscription(self, stream_client, epics, subscribed):
+        """Track the server's answer to a price subscription - only confirmed epics count as streamed"""
+        with self._lock:
+            if stream_client is not self._stream_client:
+                return  # A subscription from an earlier connection
+            if subscribed:
+                self._streamed.update(epics)
+            else:
+                # Rejected or ended - polled again, and subscribed again on the next stream() call
+                self._streamed.difference_update(epics)
+                self._requested.difference_update(epics)
+    
+    def add_tick_listener(self, callback):
+        """Call callback(epic, mid) on every streamed price"""
+        self._tick_listeners.append(callback)
+    
+    def remove_tick_listener(self, callback):
+        if callback in self._tick_listeners:
+            self._tick_listeners.remove(callback)
+    
+    def _on_tick(self, epic, price_data):
+        if not price_data.get('mid'):
+            return
+        self._prices[epic] = (time.monotonic(), price_data)
+        for callback in list(self._tick_listeners):
+            callback(epic, price_data['mid'])
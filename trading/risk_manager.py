@@ -5,12 +5,24 @@ Monitors account status and enforces trading limits
 import time
 from datetime import datetime, timedelta
 
+from trading.price_cache import PriceCache
+
+RISK_PRICE_TTL = 5.0  # Seconds a cached price is close enough for a risk estimate
+ACCOUNT_TTL = 2.0  # Seconds /accounts and open positions are reused - one fetch per can_trade pass
+MARKET_DETAILS_TTL = 60 * 60  # Dealing rules and margin factors change over hours, not seconds
+
+
+def to_pence(amount):
+    """GBP amount as whole pence, so money sums and limit checks don't pick up float error"""
+    return int(round(amount * 100))
+
 
 class RiskManager:
     """Risk management and position monitoring"""
 
-    def __init__(self, ig_client):
+    def __init__(self, ig_client, price_cache=None):
         self.ig_client = ig_client
+        self.price_cache = price_cache or PriceCache(ig_client)  # Shared with the strategies
 
         # Risk limits - adjust these to your comfort level
         self.max_daily_loss = 200.0  # GBP - adjust based on your account size
@@ -23,57 +35,33 @@ class RiskManager:
         self.daily_start_balance = None
         self.session_start_time = datetime.now()
 
-        def calculate_required_margin(self, epic, size):
-            """Estimate margin required for a new position"""
-            try:
-                # Get market info to find margin factor
-                url = f"{self.ig_client.base_url}/markets/{epic}"
-                response = self.ig_client.session.get(url)
-
-                if response.status_code == 200:
-                    data = response.json()
-                    dealing_rules = data.get('dealingRules', {})
-                    margin_factor = float(dealing_rules.get(
-                        'marketOrderPreference', {}).get('marginFactor', 0.05))
-
-                    # Get current price
-                    price_data = self.ig_client.get_market_price(epic)
-                    if price_data and price_data['mid']:
-                        notional_value = size * price_data['mid']
-                        required_margin = notional_value * margin_factor
-                        return required_margin
-
-                return None
-            except Exception as e:
-                print(f"Margin calculation error: {e}")
-                return None
-
-    def check_margin_for_order(self, epic, size, margin_limit=0.3):
-        """Check if placing this order would exceed margin limit"""
-        account_info = self.get_account_info()
-        if not account_info:
-            return False, "Cannot check margin - account info unavailable", None
-
-        required_margin = self.calculate_required_margin(epic, size)
-        if required_margin is None:
-            return False, "Cannot calculate required margin", None
-
-        available = account_info['available']
-        total_funds = account_info['deposit']
-
-        if total_funds > 0:
-            current_margin_used = total_funds - available
-            new_margin_used = current_margin_used + required_margin
-            new_margin_ratio = new_margin_used / total_funds
-
-            would_exceed = new_margin_ratio > margin_limit
+        # (fetched_at, data) of the last /accounts and open positions fetches
+        self._account_cache = (0.0, None)
+        self._positions_cache = (0.0, None)
+        self._market_details = {}  # {epic: (fetched_at, details)}
 
-            return not would_exceed, new_margin_ratio, required_margin
+    def get_account_info(self):
+        """Get account balance and margin info - reused for ACCOUNT_TTL seconds"""
+        fetched_at, account_info = self._account_cache
+        if account_info is not None and time.monotonic() - fetched_at < ACCOUNT_TTL:
+            return account_info
+
+        account_info = self._fetch_account_info()
+        if account_info is not None:
+            self._account_cache = (time.monotonic(), account_info)
+        return account_info
+
+    def get_open_positions(self):
+        """Get open positions - reused for ACCOUNT_TTL seconds"""
+        fetched_at, positions = self._positions_cache
+        if positions is not None and time.monotonic() - fetched_at < ACCOUNT_TTL:
+            return positions
 
-        return False, "Cannot calculate margin", None
+        positions = self.ig_client.get_open_positions()
+        self._positions_cache = (time.monotonic(), positions)
+        return positions
 
-    def get_account_info(self):
-        """Get account balance and margin info"""
+    def _fetch_account_info(self):
         try:
             url = f"{self.ig_client.base_url}/accounts"
             response = self.ig_client.session.get(url)
@@ -106,7 +94,7 @@ class RiskManager:
                 account_info['profit_loss']
 
         current_balance = account_info['balance']
-        daily_pnl = current_balance - self.daily_start_balance
+        daily_pnl = (to_pence(current_balance) - to_pence(self.daily_start_balance)) / 100
 
         return {
             'daily_pnl': daily_pnl,
@@ -115,6 +103,38 @@ class RiskManager:
             'unrealized_pnl': account_info['profit_loss']
         }
     
+    def get_market_details(self, epic):
+        """Get market details (incl. margin factor) - reused for MARKET_DETAILS_TTL seconds"""
+        cached = self._market_details.get(epic)
+        if cached and time.monotonic() - cached[0] < MARKET_DETAILS_TTL:
+            return cached[1]
+
+        details = self.ig_client.get_market_details(epic)
+        if details:
+            self._market_details[epic] = (time.monotonic(), details)
+        return details
+
+    def calculate_required_margin(self, epic, size):
+        """Estimate margin required for a new position - falls back to 5% of notional without market details"""
+        try:
+            price_data = self.price_cache.get(epic, ttl=RISK_PRICE_TTL)
+            if not price_data or not price_data['mid']:
+                return None
+            notional_value = size * price_data['mid']
+
+            # Margin factor is on the instrument - a percentage of notional, or points per unit of size
+            details = self.get_market_details(epic)
+            if details and details.get('margin_factor') is not None:
+                margin_factor = float(details['margin_factor'])
+                if details['margin_factor_unit'] == 'POINTS':
+                    return size * margin_factor
+                return notional_value * margin_factor / 100
+
+            return notional_value * 0.05
+        except Exception as e:
+            print(f"Margin calculation error: {e}")
+            return None
+
     def check_margin_for_order(self, epic, size, margin_limit=0.3):
         """Check if placing this order would exceed margin limit"""
         account_info = self.get_account_info()
@@ -127,16 +147,11 @@ class RiskManager:
         if balance <= 0:
             return True, None, None
         
-        # Get current price to estimate required margin
-        price_data = self.ig_client.get_market_price(epic)
-        if not price_data or not price_data['mid']:
+        # Instrument's margin factor, or 5% of notional when it can't be looked up
+        estimated_margin_required = self.calculate_required_margin(epic, size)
+        if estimated_margin_required is None:
             return True, None, None  # Can't estimate, allow it
         
-        # Rough estimate: margin = 5% of notional value for most instruments
-        # (This is approximate - actual margin varies by instrument)
-        notional_value = size * price_data['mid']
-        estimated_margin_required = notional_value * 0.05
-        
         new_total_margin = current_margin + estimated_margin_required
         new_margin_ratio = new_total_margin / balance
         
@@ -146,7 +161,7 @@ class RiskManager:
 
     def check_position_limits(self, proposed_size, epic=None):
         """Check if new position would exceed limits"""
-        positions = self.ig_client.get_open_positions()
+        positions = self.get_open_positions()
 
         # Check maximum positions
         if len(positions) >= self.max_positions:
@@ -156,27 +171,20 @@ class RiskManager:
         if proposed_size > self.max_position_size:
             return False, f"Position size {proposed_size} exceeds maximum {self.max_position_size}"
 
-        # Calculate total exposure
-        total_exposure = 0
-        for pos in positions:
-            pos_data = pos.get('position', {})
-            market_data = pos.get('market', {})
-
-            size = pos_data.get('dealSize', 0)
-            current_price = market_data.get(
-                'offer', 0)  # Conservative estimate
-
-            if size and current_price:
-                total_exposure += abs(size * current_price)
+        # Calculate total exposure - offer is the conservative price estimate; missing values count as 0
+        total_exposure = sum(
+            abs((pos.get('position', {}).get('dealSize') or 0) * (pos.get('market', {}).get('offer') or 0))
+            for pos in positions
+        )
 
         # Add proposed position exposure (estimate)
         if epic:
-            price_data = self.ig_client.get_market_price(epic)
+            price_data = self.price_cache.get(epic, ttl=RISK_PRICE_TTL)
             if price_data and price_data['mid']:
                 proposed_exposure = abs(proposed_size * price_data['mid'])
                 total_exposure += proposed_exposure
 
-        if total_exposure > self.max_total_exposure:
+        if to_pence(total_exposure) > to_pence(self.max_total_exposure):
             return False, f"Total exposure {total_exposure:.2f} exceeds limit {self.max_total_exposure}"
 
         return True, "Position limits OK"
@@ -189,7 +197,7 @@ class RiskManager:
 
         daily_pnl = pnl_data['daily_pnl']
 
-        if daily_pnl <= -self.max_daily_loss:
+        if to_pence(daily_pnl) <= -to_pence(self.max_daily_loss):
             return False, f"Daily loss limit breached: {daily_pnl:.2f} GBP (limit: {self.max_daily_loss})"
 
         return True, f"Daily P&L: {daily_pnl:.2f} GBP"
@@ -243,7 +251,7 @@ class RiskManager:
         """Get comprehensive risk summary for display"""
         account_info = self.get_account_info()
         pnl_data = self.calculate_daily_pnl()
-        positions = self.ig_client.get_open_positions()
+        positions = self.get_open_positions()
 
         summary = {
             'account_balance': account_info['balance'] if account_info else 0,
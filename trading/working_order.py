@@ -0,0 +1,34 @@
+"""
+Working Order
+Typed view of an IG working order, parsed once per check
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True, slots=True)
+class WorkingOrder:
+    """The fields the strategies read from a /workingorders entry"""
+    epic: Optional[str]
+    level: Optional[float]
+    direction: Optional[str]
+    deal_id: Optional[str]
+    stop_level: Optional[float]
+    guaranteed_stop: bool
+
+
+def parse_working_order(raw):
+    """Build a WorkingOrder from a /workingorders entry"""
+    order_data = raw.get('workingOrderData') or {}
+    market_data = raw.get('marketData') or {}
+    level = order_data.get('orderLevel')  # v2 responses
+    if level is None:
+        level = order_data.get('level')  # v1 responses
+    return WorkingOrder(
+        epic=market_data.get('epic'),
+        level=level,
+        direction=order_data.get('direction'),
+        deal_id=order_data.get('dealId'),
+        stop_level=order_data.get('stopLevel'),
+        guaranteed_stop=order_data.get('guaranteedStop', False)
+    )
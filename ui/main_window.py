@@ -10,10 +10,12 @@ from api.trend_analyzer import TrendAnalyzer
 from api.notification_system import NotificationSystem
 from api.watchlist_manager import WatchlistManager
 from api.instrument_groups import InstrumentGroups
+from trading.working_order import parse_working_order
 import customtkinter as ctk
 from tkinter import scrolledtext, messagebox, simpledialog
 from typing import List, Dict
 import tkinter as tk 
+import queue
 import threading
 import time
 
@@ -21,6 +23,8 @@ import time
 ctk.set_appearance_mode("dark")  # "dark" or "light"
 ctk.set_default_color_theme("blue")  # We'll override with Polaris colors
 
+LOG_DRAIN_MS = 50  # Queued log lines are written to the Activity Log this often, in one insert
+
 
 class Theme:
     """Centralized theme configuration"""
@@ -151,7 +155,7 @@ class MainWindow:
     def __init__(self, config, ig_client, ladder_strategy, auto_strategy, risk_manager):
         self.config = config
         self.ig_client = ig_client
-        self.cached_scanner = CachedMarketScanner(ig_client)
+        self._cached_scanner = None  # Built on first scan - loading its cache file slows startup
         self.position_monitor = PositionMonitor(ig_client)
         self.ladder_strategy = ladder_strategy
         self.auto_strategy = auto_strategy
@@ -159,6 +163,8 @@ class MainWindow:
         self.root = None
         self.auto_trading = False
         self.market_details_cache = {} 
+        self._market_names = list(config.markets)  # Market dropdown values - rebuilt only when the list changes
+        self._log_lines = queue.Queue()  # Lines waiting for _drain_log on the Tk thread
         self.instrument_groups = InstrumentGroups()
         
         # Trend Screener initialization
@@ -167,6 +173,13 @@ class MainWindow:
         self.watchlist_manager = WatchlistManager()
         self.trend_screener_running = False 
 
+    @property
+    def cached_scanner(self):
+        """Market scanner, created the first time Market Research uses it"""
+        if self._cached_scanner is None:
+            self._cached_scanner = CachedMarketScanner(self.ig_client)
+        return self._cached_scanner
+
     def on_limit_toggled(self, state):
         """Handle limit toggle"""
         if hasattr(self.ladder_strategy, 'placed_orders') and self.ladder_strategy.placed_orders:
@@ -220,7 +233,7 @@ class MainWindow:
             success_green = "#00d084"
             danger_red = "#b76e5f"
             text_white = "#f4f5f7"
-            text_gray = "#9fa6b2"
+            text_gray = Theme.TEXT_GRAY
 
             # Configure main window
             self.root.configure(fg_color=bg_dark)
@@ -346,6 +359,7 @@ class MainWindow:
                 insertbackground=accent_teal,
             )
             self.log_text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+            self.root.after(LOG_DRAIN_MS, self._drain_log)
 
             # Store left_col for use in trading tab
             self.bottom_left_col = left_col
@@ -474,11 +488,11 @@ class MainWindow:
             
     def create_trading_tab(self, parent):
         """Create trading tab with better spacing"""
-        bg_dark = "#1a1d23"
-        card_bg = "#25292e"
-        accent_teal = "#3a9d8e"
-        text_white = "#e8eaed"
-        text_gray = "#9fa6b2"
+        bg_dark = Theme.BG_DARK
+        card_bg = Theme.CARD_BG
+        accent_teal = Theme.ACCENT_TEAL
+        text_white = Theme.TEXT_WHITE
+        text_gray = Theme.TEXT_GRAY
         
         # Make scrollable
         scrollable_frame = ctk.CTkScrollableFrame(parent, fg_color=bg_dark)
@@ -503,13 +517,14 @@ class MainWindow:
                     text_color=text_white, width=60, anchor="w").grid(row=0, column=0, padx=(0,5), sticky="w")
         
         self.market_var = ctk.StringVar(value="Gold Spot")
-        ctk.CTkComboBox(
+        self.market_dropdown = ctk.CTkComboBox(
             row1, variable=self.market_var,
-            values=list(self.config.markets.keys()),
+            values=self._market_names,
             width=160, height=30,
             fg_color=card_bg, button_color=accent_teal,
             font=Theme.font_normal()
-        ).grid(row=0, column=1, padx=5)
+        )
+        self.market_dropdown.grid(row=0, column=1, padx=5)
         
         ctk.CTkButton(row1, text="Get Price", command=self.on_get_price,
                     fg_color="#3e444d", hover_color="#4a5159",
@@ -523,7 +538,6 @@ class MainWindow:
         
         # Row 2: Direction & Parameters - GRID LAYOUT
         row2 = ctk.CTkFrame(placement_card, fg_color=card_bg)
-        row2.pack(fill="x", pady=8, padx=20)
         
         ctk.CTkLabel(row2, text="Direction:", font=Theme.font_normal(),
                     text_color=text_white, width=80, anchor="w").grid(row=0, column=0, sticky="w")
@@ -538,37 +552,24 @@ class MainWindow:
                         value="SELL", fg_color="#e74c3c",
                         font=Theme.font_normal()).pack(side='left', padx=5)
         
-        # Offset
-        ctk.CTkLabel(row2, text="Offset:", font=Theme.font_normal(),
-                    text_color=text_gray, width=50, anchor="e").grid(row=0, column=2, padx=(20,5))
-        self.offset_var = ctk.StringVar(value="5")
-        ctk.CTkEntry(row2, textvariable=self.offset_var, width=50, height=30,
-                    fg_color=card_bg, border_color="#3e444d",
-                    font=Theme.font_normal()).grid(row=0, column=3)
-        
-        # Step
-        ctk.CTkLabel(row2, text="Step:", font=Theme.font_normal(),
-                    text_color=text_gray, width=50, anchor="e").grid(row=0, column=4, padx=(20,5))
-        self.step_var = ctk.StringVar(value="10")
-        ctk.CTkEntry(row2, textvariable=self.step_var, width=50, height=30,
-                    fg_color=card_bg, border_color="#3e444d",
-                    font=Theme.font_normal()).grid(row=0, column=5)
-        
-        # Orders
-        ctk.CTkLabel(row2, text="Orders:", font=Theme.font_normal(),
-                    text_color=text_gray, width=50, anchor="e").grid(row=0, column=6, padx=(20,5))
-        self.num_orders_var = ctk.StringVar(value="5")
-        ctk.CTkEntry(row2, textvariable=self.num_orders_var, width=50, height=30,
-                    fg_color=card_bg, border_color="#3e444d",
-                    font=Theme.font_normal()).grid(row=0, column=7)
-        
-        # Size
-        ctk.CTkLabel(row2, text="Size:", font=Theme.font_normal(),
-                    text_color=text_gray, width=50, anchor="e").grid(row=0, column=8, padx=(20,5))
-        self.size_var = ctk.StringVar(value="0.1")
-        ctk.CTkEntry(row2, textvariable=self.size_var, width=50, height=30,
-                    fg_color=card_bg, border_color="#3e444d",
-                    font=Theme.font_normal()).grid(row=0, column=9)
+        # Offset, Step, Orders, Size - same label and entry style, two grid columns each
+        label_kw = dict(font=Theme.font_normal(), text_color=text_gray, width=50, anchor="e")
+        entry_kw = dict(width=50, height=30, fg_color=card_bg, border_color="#3e444d", font=Theme.font_normal())
+        params = [
+            ("Offset:", "offset_var", "5"),
+            ("Step:", "step_var", "10"),
+            ("Orders:", "num_orders_var", "5"),
+            ("Size:", "size_var", "0.1"),
+        ]
+        for i, (text, attr, default) in enumerate(params):
+            column = 2 + 2 * i
+            ctk.CTkLabel(row2, text=text, **label_kw).grid(row=0, column=column, padx=(20,5))
+            var = ctk.StringVar(value=default)
+            setattr(self, attr, var)
+            ctk.CTkEntry(row2, textvariable=var, **entry_kw).grid(row=0, column=column + 1)
+        
+        # Packed after its widgets are in, so the row is laid out once
+        row2.pack(fill="x", pady=8, padx=20)
         
         # Row 3: Retry Parameters - GRID LAYOUT
         row3 = ctk.CTkFrame(placement_card, fg_color=card_bg)
@@ -1263,39 +1264,32 @@ class MainWindow:
                         self.log("No working orders to update")
                         return
                     
-                    updated = 0
-                    failed = 0
+                    # Orders without an id or level can't be updated
+                    orders = [order for order in map(parse_working_order, working_orders)
+                              if order.deal_id and order.level]
+                    gslo_flags = [order.guaranteed_stop if preserve_gslo else False for order in orders]
                     
-                    for order in working_orders:
-                        try:
-                            order_data = order.get('workingOrderData', {})
-                            deal_id = order_data.get('dealId')
-                            current_level = order_data.get('orderLevel')  # Note: orderLevel not level
-                            current_gslo = order_data.get('guaranteedStop', False)
-                            
-                            # Decide GSLO for this order
-                            use_gslo = current_gslo if preserve_gslo else False
-                            
-                            if deal_id and current_level:
-                                success, message = self.ig_client.update_working_order(
-                                    deal_id, 
-                                    current_level, 
-                                    stop_distance=stop_distance,
-                                    guaranteed_stop=use_gslo  # Pass GSLO flag
-                                )
-                                
-                                if success:
-                                    updated += 1
-                                    gslo_status = "GSLO" if use_gslo else "Regular"
-                                    self.log(f"✓ Updated {deal_id}: {stop_distance}pts ({gslo_status})")
-                                else:
-                                    failed += 1
-                                    self.log(f"✗ Failed {deal_id}: {message}")
-                                
-                                time.sleep(0.3)  # Rate limiting
-                        except Exception as e:
-                            self.log(f"Error updating order: {str(e)}")
-                            failed += 1
+                    # Send together - the ladder's rate limiter keeps them inside IG's order budget
+                    results = self.ig_client.update_working_orders_batch([
+                        {
+                            'deal_id': order.deal_id,
+                            'new_level': order.level,
+                            'stop_distance': stop_distance,
+                            'guaranteed_stop': use_gslo
+                        }
+                        for order, use_gslo in zip(orders, gslo_flags)
+                    ], rate_limiter=self.ladder_strategy.rate_limiter)
+                    
+                    updated = sum(1 for success, _ in results if success)
+                    failed = len(results) - updated
+                    gslo_count = sum(1 for (success, _), use_gslo in zip(results, gslo_flags) if success and use_gslo)
+                    if updated:
+                        self.log(f"✓ Updated {updated} orders to {stop_distance}pts ({gslo_count} GSLO, {updated - gslo_count} Regular)")
+                    if failed:
+                        self.log("✗ Failed: " + ", ".join(
+                            f"{order.deal_id} ({message})"
+                            for order, (success, message) in zip(orders, results) if not success
+                        ))
                     
                     self.log(f"Stop update complete: {updated} updated, {failed} failed")
                     
@@ -1375,11 +1369,11 @@ class MainWindow:
             
     def create_order_management_tab(self, parent):
         """Create tab for managing individual orders"""
-        bg_dark = "#1a1d23"
-        card_bg = "#25292e"
-        accent_teal = "#3a9d8e"
-        text_white = "#e8eaed"
-        text_gray = "#9fa6b2"
+        bg_dark = Theme.BG_DARK
+        card_bg = Theme.CARD_BG
+        accent_teal = Theme.ACCENT_TEAL
+        text_white = Theme.TEXT_WHITE
+        text_gray = Theme.TEXT_GRAY
         
         # Main container
         container = ctk.CTkFrame(parent, fg_color=bg_dark)
@@ -1686,11 +1680,11 @@ class MainWindow:
             
     def create_position_management_tab(self, parent):
         """Create tab for managing individual positions"""
-        bg_dark = "#1a1d23"
-        card_bg = "#25292e"
-        accent_teal = "#3a9d8e"
-        text_white = "#e8eaed"
-        text_gray = "#9fa6b2"
+        bg_dark = Theme.BG_DARK
+        card_bg = Theme.CARD_BG
+        accent_teal = Theme.ACCENT_TEAL
+        text_white = Theme.TEXT_WHITE
+        text_gray = Theme.TEXT_GRAY
         
         # Main container
         container = ctk.CTkFrame(parent, fg_color=bg_dark)
@@ -2027,11 +2021,11 @@ class MainWindow:
 
     def create_risk_tab(self, parent):
         """Create risk management tab - spread out like trading tab"""
-        bg_dark = "#1a1d23"
-        card_bg = "#25292e"
-        accent_teal = "#3a9d8e"
-        text_white = "#e8eaed"
-        text_gray = "#9fa6b2"
+        bg_dark = Theme.BG_DARK
+        card_bg = Theme.CARD_BG
+        accent_teal = Theme.ACCENT_TEAL
+        text_white = Theme.TEXT_WHITE
+        text_gray = Theme.TEXT_GRAY
         
         # Make scrollable
         scrollable_frame = ctk.CTkScrollableFrame(parent, fg_color=bg_dark)
@@ -2483,7 +2477,7 @@ class MainWindow:
         text_white = "#f4f5f7"
         accent_teal = "#5aa89a"
         bg_dark = "#1e2228"
-        text_gray = "#9fa6b2"
+        text_gray = Theme.TEXT_GRAY
         
         # Create TabView for sub-tabs
         self.research_tabview = ctk.CTkTabview(parent, fg_color=bg_dark)
@@ -3472,18 +3466,25 @@ class MainWindow:
         log_message = f"[{timestamp}] {message}"
         print(log_message)
 
-        # Schedule the GUI update on the main thread
+        # No Tk calls here - _drain_log picks the line up on the main thread
+        self._log_lines.put_nowait(log_message)
+
+    def _drain_log(self):
+        """Write every queued log line with one insert, then check again in LOG_DRAIN_MS"""
+        lines = []
         try:
-            if self.root and self.log_text:
-                def do_update():
-                    try:
-                        self.log_text.insert("end", log_message + "\n")  # Changed from tk.END
-                        self.log_text.see("end")  # Changed from tk.END
-                    except Exception as e:
-                        print(f"Log display error: {e}")
-                self.root.after(0, do_update)
-        except Exception as e:
-            print(f"Log error: {e}")
+            while True:
+                lines.append(self._log_lines.get_nowait())
+        except queue.Empty:
+            pass
+
+        if lines:
+            try:
+                self.log_text.insert("end", "\n".join(lines) + "\n")
+                self.log_text.see("end")
+            except Exception as e:
+                print(f"Log display error: {e}")
+        self.root.after(LOG_DRAIN_MS, self._drain_log)
 
     def on_connect(self):
             """Handle connect button"""
@@ -4211,8 +4212,8 @@ class MainWindow:
                 self.log("No orders to cancel")
 
                 # Clear the internal order list
-            if hasattr(self.ladder_strategy, 'placed_orders'):
-                self.ladder_strategy.placed_orders = []
+            if hasattr(self.ladder_strategy, 'clear_orders'):
+                self.ladder_strategy.clear_orders()
                 self.log("Internal order tracking cleared")
 
             self.on_refresh_orders()
@@ -4293,11 +4294,7 @@ class MainWindow:
             
             # Update the dropdown in Trading tab
             if hasattr(self, 'market_var'):
-                # Get current markets list
-                current_markets = list(self.config.markets.keys())
-                
-                # Update the combobox
-                self.market_dropdown.configure(values=current_markets)
+                self._refresh_market_names()
                 
                 self.log(f"✅ Added {market_name} to trading list")
                 
@@ -4331,12 +4328,11 @@ class MainWindow:
                 del self.config.markets[selected_market]
                 
                 # Update dropdown
-                current_markets = list(self.config.markets.keys())
-                self.market_dropdown.configure(values=current_markets)
+                self._refresh_market_names()
                 
                 # Select first market in list
-                if current_markets:
-                    self.market_var.set(current_markets[0])
+                if self._market_names:
+                    self.market_var.set(self._market_names[0])
                 
                 self.log(f"✅ Removed {selected_market} from trading list")
                 
@@ -4346,6 +4342,12 @@ class MainWindow:
         except Exception as e:
             self.log(f"Error removing market: {e}")
 
+    def _refresh_market_names(self):
+        """Rebuild the market dropdown values after the trading list changes"""
+        self._market_names = list(self.config.markets)
+        if hasattr(self, 'market_dropdown'):
+            self.market_dropdown.configure(values=self._market_names)
+
     def _save_markets_to_config(self):
         """Save markets list to config.py file"""
         try:
@@ -4480,7 +4482,7 @@ class MainWindow:
         self.market_var = ctk.StringVar(value="Gold Spot")
         self.market_dropdown = ctk.CTkComboBox(  # SAVE REFERENCE
             row1, variable=self.market_var,
-            values=list(self.config.markets.keys()),
+            values=self._market_names,
             width=160, height=30,
             fg_color=card_bg, button_color=accent_teal,
             font=Theme.font_normal()
@@ -4516,11 +4518,11 @@ class MainWindow:
         style = ttk.Style()
         
         # Dark theme colors
-        bg_dark = "#1a1d23"
-        card_bg = "#25292e"
-        text_white = "#e8eaed"
-        text_gray = "#9fa6b2"
-        accent_teal = "#3a9d8e"
+        bg_dark = Theme.BG_DARK
+        card_bg = Theme.CARD_BG
+        text_white = Theme.TEXT_WHITE
+        text_gray = Theme.TEXT_GRAY
+        accent_teal = Theme.ACCENT_TEAL
         success_green = "#00d084"
         warning_orange = "#ffa500"
         danger_red = "#ff4444"
@@ -4563,11 +4565,11 @@ class MainWindow:
         # Configure dark theme for treeviews
         self._configure_treeview_style()
         
-        bg_dark = "#1a1d23"
-        card_bg = "#25292e"
-        accent_teal = "#3a9d8e"
-        text_white = "#e8eaed"
-        text_gray = "#9fa6b2"
+        bg_dark = Theme.BG_DARK
+        card_bg = Theme.CARD_BG
+        accent_teal = Theme.ACCENT_TEAL
+        text_white = Theme.TEXT_WHITE
+        text_gray = Theme.TEXT_GRAY
         
         # Make scrollable
         scrollable_frame = ctk.CTkScrollableFrame(parent, fg_color=bg_dark)
@@ -4935,7 +4937,8 @@ class MainWindow:
         
         def auto_refresh_loop():
             while self.trend_screener_running:
-                self.scan_trends()
+                # scan_trends reads Tk variables and clears the results tree, so it runs on the Tk thread
+                self.root.after(0, self.scan_trends)
                 for _ in range(60):  # Check every second for 60 seconds
                     if not self.trend_screener_running:
                         break
@@ -4972,10 +4975,10 @@ class MainWindow:
         dialog.title("Add to Watchlist")
         dialog.geometry("400x250")
         
-        bg_dark = "#1a1d23"
-        card_bg = "#25292e"
-        accent_teal = "#3a9d8e"
-        text_white = "#e8eaed"
+        bg_dark = Theme.BG_DARK
+        card_bg = Theme.CARD_BG
+        accent_teal = Theme.ACCENT_TEAL
+        text_white = Theme.TEXT_WHITE
         
         dialog.configure(fg_color=bg_dark)
         
@@ -5248,10 +5251,10 @@ class MainWindow:
         manager.geometry("800x600")
         
         # Configure colors
-        bg_dark = "#1a1d23"
-        card_bg = "#25292e"
-        accent_teal = "#3a9d8e"
-        text_white = "#e8eaed"
+        bg_dark = Theme.BG_DARK
+        card_bg = Theme.CARD_BG
+        accent_teal = Theme.ACCENT_TEAL
+        text_white = Theme.TEXT_WHITE
         
         manager.configure(fg_color=bg_dark)
         